@@ -10,10 +10,15 @@ from dotenv import load_dotenv
 from open_swim.config import config
 from open_swim.device import create_device_monitor
 from open_swim.media.podcast.episodes_to_sync import update_episodes_to_sync
-from open_swim.sync import enqueue_sync
+from open_swim.sync import enqueue_device_sync, enqueue_sync
 from open_swim.media.youtube.playlists_to_sync import update_playlists_to_sync
+from open_swim.media.youtube.playlist_cache import (
+    get_playlist_information,
+    invalidate_playlist_cache,
+)
 from open_swim.media.youtube.playlists import fetch_playlist_information
 from open_swim.messaging.models import (
+    PlaylistCacheInvalidateRequest,
     PlaylistInfoRequest,
     PlaylistInfoResponse,
     PlaylistInfoVideoItem,
@@ -68,6 +73,7 @@ def _on_mqtt_connected(client: MqttClient) -> None:
     client.subscribe("openswim/episodes_to_sync")
     client.subscribe("openswim/playlists_to_sync")
     client.subscribe("openswim/playlist-info/request")
+    client.subscribe("openswim/playlist-cache/invalidate")
     enqueue_sync()
 
 
@@ -81,6 +87,8 @@ def _on_mqtt_message(client: MqttClient, topic: str, message: Any) -> None:
             update_playlists_to_sync(str(message))
         case "openswim/playlist-info/request":
             _handle_playlist_info_request(client=client, message=str(message))
+        case "openswim/playlist-cache/invalidate":
+            _handle_playlist_cache_invalidate(message=str(message))
         case _:
             print(f"[MQTT] Unhandled topic {topic}")
 
@@ -112,10 +120,17 @@ def _handle_playlist_info_request(client: MqttClient, message: str) -> None:
             playlist_id = _playlist_id_from_input(request.playlist_id)
             playlist_url = _playlist_url_from_input(request.playlist_id)
 
-            info = fetch_playlist_information(
-                playlist_url=playlist_url,
-                playlist_title=playlist_id or "playlist",
-            )
+            if playlist_id.startswith("http://") or playlist_id.startswith("https://"):
+                # No playlist id to key the cache on; ask yt-dlp directly
+                info = fetch_playlist_information(
+                    playlist_url=playlist_url,
+                    playlist_title=playlist_id or "playlist",
+                )
+            else:
+                info = get_playlist_information(
+                    playlist_id=playlist_id,
+                    playlist_title=playlist_id or "playlist",
+                )
             response = PlaylistInfoResponse(
                 success=True,
                 playlist_id=info.id,
@@ -145,10 +160,24 @@ def _handle_playlist_info_request(client: MqttClient, message: str) -> None:
     threading.Thread(target=_work, daemon=True).start()
 
 
+def _handle_playlist_cache_invalidate(message: str) -> None:
+    """Drop cached playlist metadata; an empty payload invalidates every playlist."""
+    try:
+        payload = json.loads(message) if message.strip() else {}
+        request = PlaylistCacheInvalidateRequest(**payload)
+        invalidate_playlist_cache(
+            _playlist_id_from_input(request.playlist_id) if request.playlist_id else None
+        )
+    except Exception as exc:
+        print(f"[MQTT] Failed to invalidate playlist cache: {exc}")
+
+
 def _on_device_connected(monitor: Any, device: str, mount_point: str) -> None:
     """Handle device connected event."""
     print(f"[DEVICE] Device connected: {device} at {mount_point}")
 
+    # Copy what the mirror already has first, then refresh the library and catch up
+    enqueue_device_sync()
     enqueue_sync()
 
     _publish_device_status(status="connected", device=device, mount_point=mount_point)
@@ -55,6 +55,100 @@ class Config:
             "PIPER_VOICE_MODEL_PATH", "/voices/en_US-hfc_female-medium.onnx"
         )
     )
+    piper_in_process: bool = field(
+        default_factory=lambda: os.getenv("PIPER_IN_PROCESS", "true").lower()
+        not in ("0", "false", "no")
+    )
+
+    # Library record store backend: "sqlite" or "json"
+    library_store: str = field(
+        default_factory=lambda: os.getenv("LIBRARY_STORE", "sqlite").lower()
+    )
+    library_flush_interval_seconds: float = field(
+        default_factory=lambda: float(os.getenv("LIBRARY_FLUSH_INTERVAL_SECONDS", "2"))
+    )
+    library_journal_max_bytes: int = field(
+        default_factory=lambda: int(os.getenv("LIBRARY_JOURNAL_MAX_BYTES", str(1024 * 1024)))
+    )
+    # Re-hash library blobs before treating tracks and episodes as already processed
+    library_verify_blobs: bool = field(
+        default_factory=lambda: os.getenv("LIBRARY_VERIFY_BLOBS", "false").lower() not in ("0", "false", "no")
+    )
+
+    # Text-to-speech clip cache
+    tts_cache_max_bytes: int = field(
+        default_factory=lambda: int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    )
+
+    # YouTube library pipeline
+    youtube_download_format: str = field(
+        default_factory=lambda: os.getenv("YOUTUBE_DOWNLOAD_FORMAT", "native").lower()
+    )
+    youtube_download_workers: int = field(
+        default_factory=lambda: int(os.getenv("YOUTUBE_DOWNLOAD_WORKERS", "2"))
+    )
+    youtube_process_workers: int = field(
+        default_factory=lambda: int(
+            os.getenv("YOUTUBE_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+        )
+    )
+    playlist_fetch_workers: int = field(
+        default_factory=lambda: int(os.getenv("PLAYLIST_FETCH_WORKERS", "4"))
+    )
+    playlist_cache_ttl_seconds: float = field(
+        default_factory=lambda: float(os.getenv("PLAYLIST_CACHE_TTL_SECONDS", "3600"))
+    )
+    loudnorm_two_pass: bool = field(
+        default_factory=lambda: os.getenv("LOUDNORM_TWO_PASS", "true").lower()
+        not in ("0", "false", "no")
+    )
+
+    # Podcast pipeline
+    podcast_download_workers: int = field(
+        default_factory=lambda: int(os.getenv("PODCAST_DOWNLOAD_WORKERS", "2"))
+    )
+    podcast_download_chunk_bytes: int = field(
+        default_factory=lambda: int(os.getenv("PODCAST_DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    )
+    podcast_episode_workers: int = field(
+        default_factory=lambda: int(
+            os.getenv("PODCAST_EPISODE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))
+        )
+    )
+    podcast_segment_workers: int = field(
+        default_factory=lambda: int(os.getenv("PODCAST_SEGMENT_WORKERS", str(os.cpu_count() or 1)))
+    )
+    podcast_render_mode: str = field(
+        default_factory=lambda: os.getenv("PODCAST_RENDER_MODE", "auto").lower()
+    )
+    # "stream" splits episodes while they download; "download" saves the file first
+    podcast_ingest_mode: str = field(
+        default_factory=lambda: os.getenv("PODCAST_INGEST_MODE", "stream").lower()
+    )
+    podcast_stream_min_bytes_per_second: int = field(
+        default_factory=lambda: int(os.getenv("PODCAST_STREAM_MIN_BYTES_PER_SECOND", str(256 * 1024)))
+    )
+
+    # Device copy: "file" fsyncs each copied file, "phase" each synced folder, "none" never
+    device_fsync_policy: str = field(
+        default_factory=lambda: os.getenv("DEVICE_FSYNC_POLICY", "phase").lower()
+    )
+    device_copy_buffer_bytes: int = field(
+        default_factory=lambda: int(os.getenv("DEVICE_COPY_BUFFER_BYTES", str(4 * 1024 * 1024)))
+    )
+
+    # Read-back check of device copies: "none", "sample" (a few blocks) or "full"
+    device_verify_mode: str = field(
+        default_factory=lambda: os.getenv("DEVICE_VERIFY_MODE", "none").lower()
+    )
+
+    # Device capacity planning: fill order ("podcasts", "playlists") and space left free
+    device_fill_priority: str = field(
+        default_factory=lambda: os.getenv("DEVICE_FILL_PRIORITY", "podcasts,playlists").lower()
+    )
+    device_reserve_bytes: int = field(
+        default_factory=lambda: int(os.getenv("DEVICE_RESERVE_BYTES", str(8 * 1024 * 1024)))
+    )
 
     # MQTT
     mqtt_broker_uri: Optional[str] = field(
@@ -71,6 +165,21 @@ class Config:
         """Path to podcasts library subdirectory."""
         return os.path.join(self.library_path, "podcasts")
 
+    @property
+    def blobs_path(self) -> str:
+        """Path to the content-addressed store of rendered audio."""
+        return os.path.join(self.library_path, "blobs")
+
+    @property
+    def device_mirror_path(self) -> str:
+        """Path to the staging mirror of the device tree."""
+        return os.path.join(self.library_path, "device_mirror")
+
+    @property
+    def tts_cache_path(self) -> str:
+        """Path to the synthesized speech clip cache."""
+        return os.path.join(self.library_path, "tts_cache")
+
     @property
     def temp_dir(self) -> str:
         """Cross-platform temporary directory."""
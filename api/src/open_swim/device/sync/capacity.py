@@ -0,0 +1,281 @@
+"""Deciding what fits on the device card before a sync deletes or copies anything.
+
+`plan_device_capacity()` reads the card's size and free space (`statvfs`), the
+space held by the folders the sync manages (which it may rewrite or remove),
+and the size of every file of the device mirror, rounded up to the card's
+cluster size. It then fills the budget in `DEVICE_FILL_PRIORITY` order,
+`podcasts` (newest episode first) and `playlists` (in request order, newest
+track first), keeping `DEVICE_RESERVE_BYTES` free. Within a folder the
+selection is always a newest-first run: once an item does not fit, the older
+ones in that folder are dropped too, and the next folder is tried.
+
+The plan is published before the sync touches the card. `prune_device()` then
+removes everything the plan does not keep, so that the copies which follow
+only ever add planned files and cannot run the card out of space part way.
+"""
+
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from open_swim.config import config
+from open_swim.device.sync.manifest import STAGING_DIR_NAME, prune_folder
+from open_swim.device.sync.mirror import PODCAST_FOLDER_NAME, DeviceMirror, MirrorFile, MirrorPlaylist
+from open_swim.device.sync.state import DeviceFileEntry, DevicePlaylistState, load_sync_state, save_sync_state
+from open_swim.media.youtube.playlists_to_sync import load_playlists_to_sync
+from open_swim.messaging.models import DevicePlanFolder, DevicePlanMessage
+from open_swim.messaging.progress import get_progress_reporter
+
+FILL_GROUPS = ("podcasts", "playlists")
+_DEFAULT_CLUSTER_BYTES = 32 * 1024
+
+
+@dataclass(frozen=True)
+class PlannedItem:
+    """A video or episode and the files it puts into a device folder."""
+
+    item_id: str
+    file_names: Tuple[str, ...]
+    size: int  # bytes on the card, rounded up to whole clusters
+
+
+@dataclass
+class PlannedFolder:
+    """The items requested for one device folder, newest first, and how many of them fit."""
+
+    name: str
+    items: List[PlannedItem]
+    playlist_id: Optional[str] = None
+    selected_count: int = 0
+
+    @property
+    def selected(self) -> List[PlannedItem]:
+        return self.items[: self.selected_count]
+
+    @property
+    def planned_bytes(self) -> int:
+        return sum(item.size for item in self.selected)
+
+    def selected_ids(self) -> Set[str]:
+        return {item.item_id for item in self.selected}
+
+    def file_names(self) -> Set[str]:
+        return {name for item in self.selected for name in item.file_names}
+
+
+@dataclass
+class DeviceCapacityPlan:
+    """What the next device sync will put on the card, and the space that leaves."""
+
+    priority: List[str]
+    capacity_bytes: int
+    free_bytes: int
+    reclaimable_bytes: int
+    reserve_bytes: int
+    playlists: List[PlannedFolder] = field(default_factory=list)
+    podcasts: Optional[PlannedFolder] = None
+
+    @property
+    def folders(self) -> List[PlannedFolder]:
+        return ([self.podcasts] if self.podcasts else []) + self.playlists
+
+    @property
+    def budget_bytes(self) -> int:
+        return max(0, self.free_bytes + self.reclaimable_bytes - self.reserve_bytes)
+
+    @property
+    def planned_bytes(self) -> int:
+        return sum(folder.planned_bytes for folder in self.folders)
+
+    @property
+    def projected_free_bytes(self) -> int:
+        return self.free_bytes + self.reclaimable_bytes - self.planned_bytes
+
+    def limit_playlists(self, playlists: List[MirrorPlaylist]) -> List[MirrorPlaylist]:
+        """The mirror playlists with their files narrowed to the ones the plan keeps."""
+        selected = {folder.playlist_id: folder.selected_ids() for folder in self.playlists}
+        return [
+            playlist.model_copy(
+                update={"files": [file for file in playlist.files if file.item_id in selected.get(playlist.id, set())]}
+            )
+            for playlist in playlists
+        ]
+
+    def limit_podcast(self, files: List[MirrorFile]) -> List[MirrorFile]:
+        """The mirror's podcast segments narrowed to the episodes the plan keeps."""
+        selected = self.podcasts.selected_ids() if self.podcasts else set()
+        return [file for file in files if file.item_id in selected]
+
+    def message(self) -> DevicePlanMessage:
+        return DevicePlanMessage(
+            priority=self.priority,
+            capacity_bytes=self.capacity_bytes,
+            free_bytes=self.free_bytes,
+            reclaimable_bytes=self.reclaimable_bytes,
+            reserve_bytes=self.reserve_bytes,
+            planned_bytes=self.planned_bytes,
+            projected_free_bytes=self.projected_free_bytes,
+            folders=[
+                DevicePlanFolder(
+                    folder=folder.name,
+                    playlist_id=folder.playlist_id,
+                    requested_items=len(folder.items),
+                    planned_items=folder.selected_count,
+                    planned_bytes=folder.planned_bytes,
+                    dropped_item_ids=[item.item_id for item in folder.items[folder.selected_count :]],
+                )
+                for folder in self.folders
+            ],
+        )
+
+
+def _card_usage(path: str) -> Tuple[int, int, int]:
+    """Cluster size, capacity and free bytes of the filesystem holding `path`."""
+    if hasattr(os, "statvfs"):
+        stats = os.statvfs(path)
+        block = stats.f_frsize or stats.f_bsize
+        return block, stats.f_blocks * block, stats.f_bavail * block
+    usage = shutil.disk_usage(path)
+    return _DEFAULT_CLUSTER_BYTES, usage.total, usage.free
+
+
+def _on_card(size: int, cluster: int) -> int:
+    return -(-size // cluster) * cluster
+
+
+def _folder_bytes(path: str, cluster: int) -> int:
+    total = 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += _on_card(os.path.getsize(os.path.join(directory, name)), cluster)
+            except OSError:
+                continue
+    return total
+
+
+def _items(files: List[MirrorFile], cluster: int) -> List[PlannedItem]:
+    """Group a folder's files (in play order) by the video or episode they belong to."""
+    grouped: Dict[str, List[MirrorFile]] = {}
+    for file in files:
+        grouped.setdefault(file.item_id, []).append(file)
+    return [
+        PlannedItem(
+            item_id=item_id,
+            file_names=tuple(file.name for file in item_files),
+            size=sum(_on_card(file.size, cluster) for file in item_files),
+        )
+        for item_id, item_files in grouped.items()
+    ]
+
+
+def _reclaimable_folders(playlists: List[MirrorPlaylist], playlist_states: List[DevicePlaylistState]) -> Set[str]:
+    """Device folders the sync will rewrite or remove."""
+    folders = {PODCAST_FOLDER_NAME, STAGING_DIR_NAME}
+    folders.update(playlist.folder for playlist in playlists)
+    planned_ids = {playlist.id for playlist in playlists}
+    requested_ids = {request.id.strip() for request in load_playlists_to_sync()}
+    for playlist_state in playlist_states:
+        # Renamed playlists move (or lose) their old folder; no longer requested ones are removed
+        if playlist_state.id in planned_ids or playlist_state.id not in requested_ids:
+            folders.add(playlist_state.title)
+    return folders
+
+
+def _fill_priority() -> List[str]:
+    priority = [group.strip() for group in config.device_fill_priority.split(",")]
+    priority = [group for group in dict.fromkeys(priority) if group in FILL_GROUPS]
+    return priority + [group for group in FILL_GROUPS if group not in priority]
+
+
+def plan_device_capacity(mirror: DeviceMirror) -> DeviceCapacityPlan:
+    """Pick the podcast episodes and playlist tracks of the mirror that fit on the card."""
+    sd_card_path = config.device_sd_path
+    cluster, capacity, free = _card_usage(sd_card_path)
+    state = load_sync_state(sd_card_path)
+    reclaimable = sum(
+        _folder_bytes(os.path.join(sd_card_path, folder), cluster)
+        for folder in _reclaimable_folders(mirror.playlists, state.playlists)
+    )
+    plan = DeviceCapacityPlan(
+        priority=_fill_priority(),
+        capacity_bytes=capacity,
+        free_bytes=free,
+        reclaimable_bytes=reclaimable,
+        reserve_bytes=config.device_reserve_bytes,
+        playlists=[
+            PlannedFolder(name=playlist.folder, items=_items(playlist.files, cluster), playlist_id=playlist.id)
+            for playlist in mirror.playlists
+        ],
+        # Newest episode first; the folder itself plays them oldest first
+        podcasts=PlannedFolder(name=PODCAST_FOLDER_NAME, items=list(reversed(_items(mirror.podcast, cluster)))),
+    )
+
+    remaining = plan.budget_bytes
+    for group in plan.priority:
+        folders = plan.playlists if group == "playlists" else [plan.podcasts] if plan.podcasts else []
+        for folder in folders:
+            for item in folder.items:
+                if item.size > remaining:
+                    break
+                remaining -= item.size
+                folder.selected_count += 1
+    return plan
+
+
+def publish_device_plan(plan: DeviceCapacityPlan) -> None:
+    mib = 1024 * 1024
+    print(
+        f"[Device Sync] Capacity plan: {plan.planned_bytes / mib:.1f} MiB planned of "
+        f"{plan.budget_bytes / mib:.1f} MiB available ({plan.free_bytes / mib:.1f} MiB free, "
+        f"{plan.reclaimable_bytes / mib:.1f} MiB reclaimable); projected free "
+        f"{plan.projected_free_bytes / mib:.1f} MiB"
+    )
+    for folder in plan.folders:
+        dropped = len(folder.items) - folder.selected_count
+        if dropped:
+            print(f"[Device Sync] Not enough space for {dropped} of {len(folder.items)} items in {folder.name}")
+    get_progress_reporter().report_device_plan(plan.message())
+
+
+def prune_device(plan: DeviceCapacityPlan) -> None:
+    """Delete files in the planned folders that the plan does not keep, before anything is copied."""
+    sd_card_path = config.device_sd_path
+    state = load_sync_state(sd_card_path)
+    freed = 0
+
+    for folder in plan.playlists:
+        playlist_state = next((p for p in state.playlists if p.id == folder.playlist_id), None)
+
+        def commit_playlist(
+            files: List[DeviceFileEntry], playlist_state: Optional[DevicePlaylistState] = playlist_state
+        ) -> None:
+            if playlist_state is not None:
+                playlist_state.files = files
+                save_sync_state(state, sd_card_path, quiet=True)
+
+        freed += prune_folder(
+            os.path.join(sd_card_path, folder.name),
+            playlist_state.files if playlist_state else [],
+            folder.file_names(),
+            commit_playlist,
+        )
+
+    if plan.podcasts is not None:
+        kept_episodes = plan.podcasts.selected_ids()
+
+        def commit_podcasts(files: List[DeviceFileEntry]) -> None:
+            state.podcasts.files = files
+            state.podcasts.synced_episode_ids = [i for i in state.podcasts.synced_episode_ids if i in kept_episodes]
+            save_sync_state(state, sd_card_path, quiet=True)
+
+        freed += prune_folder(
+            os.path.join(sd_card_path, PODCAST_FOLDER_NAME),
+            state.podcasts.files,
+            plan.podcasts.file_names(),
+            commit_podcasts,
+        )
+
+    if freed:
+        print(f"[Device Sync] Removed {freed / (1024 * 1024):.1f} MiB the plan does not keep")
@@ -0,0 +1,307 @@
+"""Copying library files onto the device card.
+
+Library reads and card writes overlap: a reader thread fills a small ring of
+large page-aligned buffers while the caller's thread writes them to the card,
+so the (slow) card never waits for the library disk and vice versa. The source
+is opened with `POSIX_FADV_SEQUENTIAL` where the platform supports it.
+
+When written data is forced onto the card is set by `DEVICE_FSYNC_POLICY`:
+
+- `file`: every copied file is fsynced before it is committed to the manifest.
+- `phase`: copied files are fsynced together at the end of the folder (or
+  before an error is raised), and only then committed. An unplug mid-folder
+  costs a re-copy of the unflushed files rather than a corrupt track.
+- `none`: the kernel writes back whenever it likes; files are committed as
+  soon as they are written.
+
+The reader thread also hashes the stream, so every copy yields the SHA-256 of
+what was written without a second pass; a source that no longer matches the
+hash its library record expects is refused. `DEVICE_VERIFY_MODE` optionally
+reads the written file back once it is on the card (its pages are dropped
+from the cache after the fsync): `sample` compares the first and last blocks
+and `VERIFY_SAMPLES` random blocks with the source, `full` re-hashes the whole
+file. Verification implies an fsync even under the `none` policy.
+
+Progress is reported in bytes through an optional callback, at most every
+`PROGRESS_INTERVAL_SECONDS`, together with the running throughput.
+"""
+
+import hashlib
+import mmap
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
+
+from open_swim.config import config
+from open_swim.media.hashing import sha256_file
+
+FSYNC_POLICIES = ("file", "phase", "none")
+VERIFY_MODES = ("none", "sample", "full")
+READ_AHEAD_BUFFERS = 4
+PROGRESS_INTERVAL_SECONDS = 0.5
+VERIFY_SAMPLES = 8
+VERIFY_SAMPLE_BYTES = 64 * 1024
+
+
+class CopyVerificationError(Exception):
+    """Raised when a copied file does not hold the bytes that were written to it."""
+
+
+class SourceMismatchError(Exception):
+    """Raised when a library file does not hash to the value its record expects."""
+
+
+@dataclass(frozen=True)
+class CopiedFile:
+    """A file written to the device and the SHA-256 of the bytes streamed into it."""
+
+    path: str
+    size: int
+    content_hash: str
+
+
+@dataclass(frozen=True)
+class CopyProgress:
+    """Bytes copied so far out of the bytes the caller expects to copy."""
+
+    bytes_copied: int
+    bytes_total: int
+    bytes_per_second: float
+
+    @property
+    def percentage(self) -> Optional[float]:
+        if not self.bytes_total:
+            return None
+        return min(100.0, self.bytes_copied / self.bytes_total * 100.0)
+
+
+def _advise(fd: int, advice_name: str) -> None:
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
+
+def _fsync_path(path: str) -> None:
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        os.fsync(fd)
+        _advise(fd, "POSIX_FADV_DONTNEED")
+    finally:
+        os.close(fd)
+
+
+def _read_at(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _sample_offsets(size: int) -> List[int]:
+    if size <= VERIFY_SAMPLE_BYTES * (VERIFY_SAMPLES + 2):
+        return list(range(0, size, VERIFY_SAMPLE_BYTES))
+    last = size - VERIFY_SAMPLE_BYTES
+    return sorted({0, last, *(random.randrange(0, last) for _ in range(VERIFY_SAMPLES))})
+
+
+def verify_copy(source_path: str, copied: CopiedFile, mode: str) -> None:
+    """Read a copied file back from the device; raise CopyVerificationError if it differs."""
+    if mode == "none":
+        return
+    if os.path.getsize(copied.path) != copied.size:
+        raise CopyVerificationError(f"{copied.path} has the wrong size on the device")
+    if mode == "full":
+        if sha256_file(copied.path) != copied.content_hash:
+            raise CopyVerificationError(f"{copied.path} does not match the copied data")
+        return
+    for offset in _sample_offsets(copied.size):
+        if _read_at(copied.path, offset, VERIFY_SAMPLE_BYTES) != _read_at(source_path, offset, VERIFY_SAMPLE_BYTES):
+            raise CopyVerificationError(f"{copied.path} differs from its source at byte {offset}")
+
+
+def _fsync_directory(path: str) -> None:
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # not every filesystem can sync a directory
+    finally:
+        os.close(fd)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class DeviceCopier:
+    """Copies files to the device with read-ahead, an fsync policy and byte progress."""
+
+    def __init__(
+        self,
+        bytes_total: int = 0,
+        on_progress: Optional[Callable[[CopyProgress], None]] = None,
+        fsync_policy: Optional[str] = None,
+        buffer_bytes: Optional[int] = None,
+        verify_mode: Optional[str] = None,
+    ) -> None:
+        policy = (fsync_policy or config.device_fsync_policy).lower()
+        if policy not in FSYNC_POLICIES:
+            print(f"[Device Copy] Unknown fsync policy '{policy}', using 'file'")
+            policy = "file"
+        verify = (verify_mode or config.device_verify_mode).lower()
+        if verify not in VERIFY_MODES:
+            print(f"[Device Copy] Unknown verify mode '{verify}', using 'sample'")
+            verify = "sample"
+        self.fsync_policy = policy
+        self.verify_mode = verify
+        self.bytes_total = bytes_total
+        self.bytes_copied = 0
+        self._on_progress = on_progress
+        size = max(mmap.PAGESIZE, buffer_bytes or config.device_copy_buffer_bytes)
+        size -= size % mmap.PAGESIZE
+        # Anonymous maps are page aligned and allocated once for every file this copier writes
+        self._buffers = [mmap.mmap(-1, size) for _ in range(READ_AHEAD_BUFFERS)]
+        self._unflushed: List[Tuple[str, CopiedFile]] = []
+        self._started_at: Optional[float] = None
+        self._last_report = 0.0
+
+    @property
+    def defers_commits(self) -> bool:
+        """Whether copied files may only be committed after `flush()`."""
+        return self.fsync_policy == "phase"
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        return self.bytes_copied / elapsed if elapsed > 0 else 0.0
+
+    def progress(self) -> CopyProgress:
+        return CopyProgress(self.bytes_copied, self.bytes_total, self.bytes_per_second)
+
+    def copy(self, source_path: str, destination_path: str, expected_hash: Optional[str] = None) -> CopiedFile:
+        """Copy one file, replacing `destination_path`, hashing it on the way.
+
+        Raises SourceMismatchError if `expected_hash` is given and the streamed
+        bytes hash differently, and CopyVerificationError if the read-back
+        check fails; the destination is removed in both cases.
+        """
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        free: "queue.Queue[Optional[mmap.mmap]]" = queue.Queue()
+        filled: "queue.Queue[Union[Tuple[mmap.mmap, int], BaseException]]" = queue.Queue()
+        for buffer in self._buffers:
+            free.put(buffer)
+        source = open(source_path, "rb", buffering=0)
+        _advise(source.fileno(), "POSIX_FADV_SEQUENTIAL")
+        # Hashed on the reader thread, which has time to spare while the card writes
+        digest = hashlib.sha256()
+
+        def read_ahead() -> None:
+            try:
+                with source:
+                    while True:
+                        buffer = free.get()
+                        if buffer is None:
+                            return
+                        count = source.readinto(buffer) or 0
+                        if count:
+                            with memoryview(buffer)[:count] as chunk:
+                                digest.update(chunk)
+                        filled.put((buffer, count))
+                        if not count:
+                            return
+            except BaseException as exc:
+                filled.put(exc)
+
+        reader = threading.Thread(target=read_ahead, name="device-copy-read-ahead", daemon=True)
+        reader.start()
+        written = 0
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+            fd = os.open(destination_path, flags, 0o644)
+            try:
+                while True:
+                    item = filled.get()
+                    if isinstance(item, BaseException):
+                        raise item
+                    buffer, count = item
+                    if not count:
+                        break
+                    view = memoryview(buffer)[:count]
+                    try:
+                        while view:
+                            view = view[os.write(fd, view):]
+                    finally:
+                        view.release()
+                    free.put(buffer)
+                    written += count
+                    self._advance(count)
+                if self.fsync_policy == "file" or (self.fsync_policy == "none" and self.verify_mode != "none"):
+                    os.fsync(fd)
+                    _advise(fd, "POSIX_FADV_DONTNEED")
+            finally:
+                os.close(fd)
+        finally:
+            free.put(None)
+            reader.join()
+
+        copied = CopiedFile(destination_path, written, digest.hexdigest())
+        try:
+            if expected_hash is not None and copied.content_hash != expected_hash:
+                raise SourceMismatchError(f"{source_path} does not match its library hash {expected_hash}")
+            if self.fsync_policy == "phase":
+                self._unflushed.append((source_path, copied))
+            else:
+                verify_copy(source_path, copied, self.verify_mode)
+        except Exception:
+            _remove_quietly(destination_path)
+            raise
+        return copied
+
+    def flush(self) -> List[str]:
+        """Force every file copied since the last flush onto the card (`phase` policy).
+
+        Returns the destinations that failed read-back verification; those
+        files are removed from the device.
+        """
+        unflushed, self._unflushed = self._unflushed, []
+        for _, copied in unflushed:
+            _fsync_path(copied.path)
+        for directory in {os.path.dirname(copied.path) for _, copied in unflushed}:
+            _fsync_directory(directory)
+        failed: List[str] = []
+        for source_path, copied in unflushed:
+            try:
+                verify_copy(source_path, copied, self.verify_mode)
+            except CopyVerificationError as exc:
+                print(f"[Device Copy] {exc}")
+                _remove_quietly(copied.path)
+                failed.append(copied.path)
+        return failed
+
+    def _advance(self, count: int) -> None:
+        self.bytes_copied += count
+        if self._on_progress is None:
+            return
+        now = time.monotonic()
+        finished = 0 < self.bytes_total <= self.bytes_copied
+        if finished or now - self._last_report >= PROGRESS_INTERVAL_SECONDS:
+            self._last_report = now
+            self._on_progress(self.progress())
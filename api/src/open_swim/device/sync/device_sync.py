@@ -1,15 +1,20 @@
-from typing import List
+from open_swim.device.sync.capacity import plan_device_capacity, prune_device, publish_device_plan
+from open_swim.device.sync.mirror import DeviceMirror
 from open_swim.device.sync.youtube.device_youtube_sync import sync_device_playlists_videos
 from open_swim.device.sync.youtube.device_playlist_dirs_sync import sync_playlists_directories
 
 from open_swim.device.sync.podcast.device_podcast_dirs_sync import create_podcast_folder
 from open_swim.device.sync.podcast.device_podcast_sync import sync_podcast_episodes_to_device
 
-from open_swim.media.youtube.playlists import PlaylistInfo
 
-def sync_device(playlists_to_sync: List[PlaylistInfo])-> None:
-    sync_playlists_directories(playlists_to_sync)
-    sync_device_playlists_videos(play_lists=playlists_to_sync)
-    
+def sync_device(mirror: DeviceMirror) -> None:
+    # Decide what fits and publish it before anything on the card is deleted
+    capacity_plan = plan_device_capacity(mirror)
+    publish_device_plan(capacity_plan)
+
+    sync_playlists_directories(mirror.playlists)
     create_podcast_folder()
-    sync_podcast_episodes_to_device()
\ No newline at end of file
+    prune_device(capacity_plan)
+
+    sync_device_playlists_videos(play_lists=capacity_plan.limit_playlists(mirror.playlists))
+    sync_podcast_episodes_to_device(capacity_plan.limit_podcast(mirror.podcast))
@@ -0,0 +1,362 @@
+"""Incremental, play-order-preserving sync of a device folder against its manifest.
+
+The OpenSwim player plays a folder in FAT directory-entry order, and FAT gives
+a new entry the first free run of slots, which may be a hole left by an earlier
+deletion. Writing files "in order" therefore only produces that order in an
+empty directory region.
+
+`plan_folder_sync()` reads the folder in directory order (`os.listdir` returns
+FAT entries in on-disk order) and keeps the longest leading run that already
+matches the start of the target play order and the manifest (name, content
+hash, size). Everything behind that run is cleared: target files already on the
+card are renamed into a staging folder on the same card (no data is copied) and
+everything else is deleted. `apply_folder_plan()` then fills the cleared space
+in play order, renaming staged files back and copying only the files the card
+does not have (through `DeviceCopier`). The result is checked against `os.listdir`; if a hole hidden
+inside the kept run let an entry land early, the folder is re-sequenced by
+renames alone.
+
+Every removal, move and copy is committed to the manifest as it happens, so a
+sync cut short by unplugging resumes with the files already on the card
+(including ones left in staging). A file that was being copied when the device
+went away is not in the manifest and is replaced; with the `phase` fsync policy
+that holds for every copy not yet flushed. On filesystems whose listing
+order is not entry order (a development directory on ext4, say), manifest
+positions stand in for the directory order and the check is skipped.
+"""
+
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from open_swim.device.sync.copy_engine import CopyVerificationError, DeviceCopier
+from open_swim.device.sync.state import DeviceFileEntry
+
+STAGING_DIR_NAME = ".openswim-staging"
+_ENTRY_ORDER_FILESYSTEMS = {"vfat", "msdos", "fat", "exfat"}
+
+
+class DeviceCopyError(Exception):
+    """Raised when a file cannot be copied to the device."""
+
+    def __init__(self, target: "TargetFile", position: int, cause: Exception) -> None:
+        super().__init__(str(cause))
+        self.target = target
+        self.position = position
+
+
+@dataclass(frozen=True)
+class TargetFile:
+    """A library file that should be in a device folder, in play order."""
+
+    name: str
+    source_path: str
+    size: int
+    content_hash: str
+    item_id: Optional[str] = None
+
+    def entry(self, position: int) -> DeviceFileEntry:
+        return DeviceFileEntry(
+            name=self.name,
+            size=self.size,
+            content_hash=self.content_hash,
+            position=position,
+            item_id=self.item_id,
+        )
+
+
+@dataclass(frozen=True)
+class PlacedFile:
+    """A target file written behind the kept run, either from staging or copied from the library."""
+
+    position: int
+    target: TargetFile
+    from_staging: bool
+
+
+@dataclass
+class FolderPlan:
+    """How to bring a device folder to its target play order."""
+
+    targets: List[TargetFile]
+    keep: List[DeviceFileEntry] = field(default_factory=list)
+    stage: List[str] = field(default_factory=list)
+    remove: List[str] = field(default_factory=list)
+    discard_staged: List[str] = field(default_factory=list)
+    place: List[PlacedFile] = field(default_factory=list)
+
+    @property
+    def up_to_date(self) -> bool:
+        return not (self.stage or self.remove or self.discard_staged or self.place)
+
+    @property
+    def copies(self) -> List[PlacedFile]:
+        return [placed for placed in self.place if not placed.from_staging]
+
+    @property
+    def bytes_to_copy(self) -> int:
+        return sum(placed.target.size for placed in self.copies)
+
+
+def staging_path(folder_path: str) -> str:
+    """Staging folder for `folder_path`, on the same filesystem so moves are renames."""
+    return os.path.join(os.path.dirname(folder_path), STAGING_DIR_NAME, os.path.basename(folder_path))
+
+
+def has_entry_order(path: str) -> bool:
+    """Whether `os.listdir(path)` lists entries in on-disk (FAT directory) order."""
+    if not sys.platform.startswith("linux"):
+        return True  # the device card is FAT wherever it is mounted
+    real_path = os.path.realpath(path)
+    best_mount, best_type = "", ""
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                inside = real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fields[2]
+    except OSError:
+        return True
+    return best_type in _ENTRY_ORDER_FILESYSTEMS
+
+
+def _size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _list(path: str) -> List[str]:
+    return os.listdir(path) if os.path.isdir(path) else []
+
+
+def _directory_order(folder_path: str, manifest: Dict[str, DeviceFileEntry], entry_order: bool) -> List[str]:
+    names = _list(folder_path)
+    if entry_order:
+        return names
+    recorded = sorted(
+        (entry for entry in manifest.values() if entry.name in names), key=lambda entry: entry.position
+    )
+    recorded_names = {entry.name for entry in recorded}
+    return [entry.name for entry in recorded] + [name for name in names if name not in recorded_names]
+
+
+def _is_intact(directory: str, entry: Optional[DeviceFileEntry], target: TargetFile) -> bool:
+    return bool(
+        entry
+        and entry.content_hash == target.content_hash
+        and _size(os.path.join(directory, entry.name)) == entry.size
+    )
+
+
+def plan_folder_sync(
+    folder_path: str,
+    manifest: List[DeviceFileEntry],
+    targets: List[TargetFile],
+    entry_order: Optional[bool] = None,
+) -> FolderPlan:
+    """Diff the folder (in directory order) and its manifest against the target play order."""
+    if entry_order is None:
+        entry_order = has_entry_order(folder_path) if os.path.isdir(folder_path) else True
+    entries = {entry.name: entry for entry in manifest}
+    listing = _directory_order(folder_path, entries, entry_order)
+
+    plan = FolderPlan(targets=targets)
+    for name, target in zip(listing, targets):
+        if name != target.name or not _is_intact(folder_path, entries.get(name), target):
+            break
+        plan.keep.append(entries[name])
+    kept = len(plan.keep)
+
+    pending = {target.name: target for target in targets[kept:]}
+    on_device: Set[str] = set()
+    for name in listing[kept:]:
+        pending_target = pending.get(name)
+        if pending_target is not None and _is_intact(folder_path, entries.get(name), pending_target):
+            plan.stage.append(name)
+            on_device.add(name)
+        else:
+            plan.remove.append(name)
+
+    staging = staging_path(folder_path)
+    for name in _list(staging):
+        pending_target = pending.get(name)
+        if (
+            pending_target is not None
+            and name not in on_device
+            and _is_intact(staging, entries.get(name), pending_target)
+        ):
+            on_device.add(name)
+        else:
+            plan.discard_staged.append(name)
+
+    plan.place = [
+        PlacedFile(position=position, target=target, from_staging=target.name in on_device)
+        for position, target in enumerate(targets)
+        if position >= kept
+    ]
+    return plan
+
+
+def _delete(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def prune_folder(
+    folder_path: str,
+    manifest: List[DeviceFileEntry],
+    keep_names: Set[str],
+    commit: Callable[[List[DeviceFileEntry]], None],
+) -> int:
+    """Delete everything in the folder and its staging area not named in `keep_names`.
+
+    Used to free space before any copying starts; the later plan treats the
+    gaps like any other. Returns the number of bytes freed.
+    """
+    entries = {entry.name: entry for entry in manifest}
+    freed = 0
+    for directory in (folder_path, staging_path(folder_path)):
+        for name in _list(directory):
+            if name in keep_names:
+                continue
+            if entries.pop(name, None) is not None:
+                commit(sorted(entries.values(), key=lambda entry: entry.position))
+            path = os.path.join(directory, name)
+            freed += _size(path) or 0
+            _delete(path)
+    _remove_empty_staging(staging_path(folder_path))
+    return freed
+
+
+def apply_folder_plan(
+    folder_path: str,
+    plan: FolderPlan,
+    manifest: List[DeviceFileEntry],
+    commit: Callable[[List[DeviceFileEntry]], None],
+    on_copy: Optional[Callable[[PlacedFile], None]] = None,
+    entry_order: Optional[bool] = None,
+    copier: Optional[DeviceCopier] = None,
+) -> None:
+    """Carry out a plan, calling `commit(manifest)` after every change to the folder.
+
+    Copies go through `copier` (a default `DeviceCopier` if not given), which
+    checks the streamed bytes against the target's content hash; when its
+    fsync policy defers commits, copied files are committed once flushed and
+    verified. Raises DeviceCopyError if a library file cannot be copied or a
+    copy fails verification; everything committed before it stays valid for
+    the next run.
+    """
+    entries = {entry.name: entry for entry in manifest}
+    staging = staging_path(folder_path)
+    copier = copier or DeviceCopier(bytes_total=plan.bytes_to_copy)
+    unflushed: List[PlacedFile] = []
+    os.makedirs(folder_path, exist_ok=True)
+
+    def _commit() -> None:
+        commit(sorted(entries.values(), key=lambda entry: entry.position))
+
+    def _commit_copied() -> Optional[PlacedFile]:
+        """Flush deferred copies and commit those that verified; return the first that did not."""
+        if not unflushed:
+            return None
+        failed = set(copier.flush())
+        rejected: Optional[PlacedFile] = None
+        for placed in unflushed:
+            if os.path.join(folder_path, placed.target.name) in failed:
+                rejected = rejected or placed
+            else:
+                entries[placed.target.name] = placed.target.entry(placed.position)
+        unflushed.clear()
+        _commit()
+        return rejected
+
+    for name in plan.discard_staged:
+        entries.pop(name, None)
+        _commit()
+        _delete(os.path.join(staging, name))
+    if plan.stage:
+        os.makedirs(staging, exist_ok=True)
+    for name in plan.stage:
+        os.replace(os.path.join(folder_path, name), os.path.join(staging, name))
+    for name in plan.remove:
+        if entries.pop(name, None) is not None:
+            _commit()
+        _delete(os.path.join(folder_path, name))
+
+    for placed in plan.place:
+        target = placed.target
+        destination = os.path.join(folder_path, target.name)
+        if placed.from_staging:
+            os.replace(os.path.join(staging, target.name), destination)
+        else:
+            if on_copy is not None:
+                on_copy(placed)
+            try:
+                copier.copy(target.source_path, destination, expected_hash=target.content_hash)
+            except Exception as exc:
+                try:
+                    _commit_copied()
+                except OSError:
+                    pass  # the card is likely gone; those files are copied again next time
+                raise DeviceCopyError(target, placed.position, exc) from exc
+            if copier.defers_commits:
+                unflushed.append(placed)
+                continue
+        entries[target.name] = target.entry(placed.position)
+        _commit()
+    rejected = _commit_copied()
+    if rejected is not None:
+        cause = CopyVerificationError(f"{rejected.target.name} failed read-back verification")
+        raise DeviceCopyError(rejected.target, rejected.position, cause)
+
+    if entry_order is None:
+        entry_order = has_entry_order(folder_path)
+    if entry_order:
+        _verify_order(folder_path, plan.targets)
+    _remove_empty_staging(staging)
+
+
+def _verify_order(folder_path: str, targets: List[TargetFile]) -> None:
+    """Re-sequence the folder by renames if its entry order does not match the targets."""
+    expected = [target.name for target in targets]
+    if os.listdir(folder_path) == expected:
+        return
+    print(f"[Device Sync] Directory order of {folder_path} is off, re-sequencing by renames")
+    staging = staging_path(folder_path)
+    os.makedirs(staging, exist_ok=True)
+    for name in expected:
+        os.replace(os.path.join(folder_path, name), os.path.join(staging, name))
+    for name in expected:
+        os.replace(os.path.join(staging, name), os.path.join(folder_path, name))
+    if os.listdir(folder_path) != expected:
+        print(f"[Device Sync] Warning: could not establish play order in {folder_path}")
+
+
+def _remove_empty_staging(staging: str) -> None:
+    for directory in (staging, os.path.dirname(staging)):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+
+
+def adopt_existing_files(folder_path: str, targets: List[TargetFile]) -> List[DeviceFileEntry]:
+    """Manifest entries for a folder written in target order before manifests existed.
+
+    Only used when the folder is known to hold exactly the target list; returns
+    an empty manifest if any file is missing or has a different size.
+    """
+    entries = [target.entry(position) for position, target in enumerate(targets)]
+    if all(_size(os.path.join(folder_path, entry.name)) == entry.size for entry in entries):
+        return entries
+    return []
@@ -0,0 +1,334 @@
+"""Staging mirror of the device tree, kept in the library while the worker is idle.
+
+A device is usually plugged in for a few minutes before a swim, so everything
+that does not need the card is done ahead of time. At the end of every library
+sync `build_device_mirror()` resolves what the card should hold and keeps it
+under `LIBRARY_PATH/device_mirror/`:
+
+- one folder per playlist (sanitized title) and `podcast/`, holding hard links
+  to the library blobs under the names they get on the card;
+- `mirror.json`, listing every folder's files in play order with their size,
+  content hash and the video or episode they belong to.
+
+Only links whose content changed are touched on a rebuild. When a device is
+connected the sync reads `mirror.json` and diffs it against the device
+manifest; nothing is resolved, looked up in the library or hashed before the
+first copy starts. The links also keep every file the mirror lists readable
+until the next rebuild, whatever happens to the library in between.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+from open_swim.config import config
+from open_swim.device.sync.manifest import TargetFile
+from open_swim.device.sync.youtube.sanitize import sanitize_playlist_title
+from open_swim.media import blob_store
+from open_swim.media.hashing import sha256_file
+from open_swim.media.podcast import store as podcast_store
+from open_swim.media.podcast.episodes_to_sync import load_episodes_to_sync
+from open_swim.media.podcast.models import EpisodeRecord
+from open_swim.media.youtube import store as youtube_store
+from open_swim.media.youtube.models import VideoRecord
+from open_swim.media.youtube.playlists import PlaylistInfo, YoutubeVideo
+from open_swim.media.youtube.playlists_to_sync import load_playlists_to_sync
+from open_swim.messaging.models import SyncItemStatus, SyncPhase, SyncProgressMessage
+from open_swim.messaging.progress import get_progress_reporter
+
+# Maximum number of videos to sync per playlist (newest first)
+PLAYLIST_SYNC_LIMIT = int(os.environ.get("PLAYLIST_SYNC_LIMIT", "20"))
+
+PODCAST_FOLDER_NAME = "podcast"
+MIRROR_FILE_NAME = "mirror.json"
+
+
+class MirrorFile(BaseModel):
+    """A file of a device folder, in play order."""
+
+    name: str
+    size: int
+    content_hash: str
+    item_id: str
+    item_title: str = ""
+
+
+class MirrorPlaylist(BaseModel):
+    """A playlist folder of the device tree."""
+
+    id: str
+    title: str
+    folder: str
+    playlist_hash: str
+    files: List[MirrorFile] = Field(default_factory=list)
+
+
+class DeviceMirror(BaseModel):
+    """The device tree the next sync should produce."""
+
+    built_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    playlists: List[MirrorPlaylist] = Field(default_factory=list)
+    podcast: List[MirrorFile] = Field(default_factory=list)
+
+
+def _mirror_file_path() -> str:
+    return os.path.join(config.device_mirror_path, MIRROR_FILE_NAME)
+
+
+def mirror_targets(folder: str, files: List[MirrorFile]) -> List[TargetFile]:
+    """Targets for a device folder, read from the mirror's links."""
+    folder_path = os.path.join(config.device_mirror_path, folder)
+    return [
+        TargetFile(
+            name=file.name,
+            source_path=os.path.join(folder_path, file.name),
+            size=file.size,
+            content_hash=file.content_hash,
+            item_id=file.item_id,
+        )
+        for file in files
+    ]
+
+
+def _device_playlist_videos(playlist: PlaylistInfo) -> List[YoutubeVideo]:
+    """Videos of a playlist that belong on the device, newest first."""
+    return list(reversed(playlist.videos))[:PLAYLIST_SYNC_LIMIT]
+
+
+def _calculate_playlist_hash(videos: List[YoutubeVideo]) -> str:
+    """Calculate a unique hash based on video IDs in the copy order."""
+    video_data = "".join([f"{idx}:{video.id}" for idx, video in enumerate(videos)])
+    return hashlib.sha256(video_data.encode()).hexdigest()
+
+
+def _episode_segment_paths(record: EpisodeRecord) -> List[str]:
+    """Library paths of an episode's segment files in play order."""
+    assert record.episode_dir is not None
+    if record.segments:
+        return [os.path.join(record.episode_dir, segment.name) for segment in record.segments]
+    return sorted((str(path) for path in Path(record.episode_dir).glob("*.mp3")), key=os.path.basename)
+
+
+def _report_skipped(
+    phase: SyncPhase,
+    item_id: str,
+    item_title: str,
+    current_index: int,
+    total_count: int,
+    error_message: str,
+    playlist: Optional[PlaylistInfo] = None,
+) -> None:
+    get_progress_reporter().report_progress(
+        SyncProgressMessage(
+            phase=phase,
+            status=SyncItemStatus.skipped,
+            playlist_id=playlist.id if playlist else None,
+            playlist_title=playlist.title if playlist else None,
+            item_id=item_id,
+            item_title=item_title,
+            current_index=current_index,
+            total_count=total_count,
+            error_message=error_message,
+        )
+    )
+
+
+def _mirror_playlist(
+    playlist: PlaylistInfo, library_videos: Dict[str, VideoRecord], sources: Dict[str, str]
+) -> MirrorPlaylist:
+    """Playlist files in device play order; videos without a library file are reported and skipped."""
+    folder = sanitize_playlist_title(playlist.title)
+    videos = _device_playlist_videos(playlist)
+    files: List[MirrorFile] = []
+    for video_index, video in enumerate(videos, start=1):
+        video_info = library_videos.get(video.id)
+        if video_info is None:
+            print(f"[Device Mirror] Video {video.id} not found in library, skipping")
+            error_message = "video not found in library"
+        elif not video_info.mp3_path:
+            print(f"[Device Mirror] No normalized MP3 for video {video.id} ({video.title}), skipping")
+            error_message = "no normalized mp3 path"
+        elif not os.path.exists(video_info.mp3_path):
+            print(f"[Device Mirror] Normalized MP3 file does not exist: {video_info.mp3_path}, skipping")
+            error_message = f"mp3 missing: {video_info.mp3_path}"
+        else:
+            name = os.path.basename(video_info.mp3_path)
+            files.append(
+                MirrorFile(
+                    name=name,
+                    size=os.path.getsize(video_info.mp3_path),
+                    content_hash=video_info.blob_hash or sha256_file(video_info.mp3_path),
+                    item_id=video.id,
+                    item_title=video.title,
+                )
+            )
+            sources[os.path.join(folder, name)] = video_info.mp3_path
+            continue
+        _report_skipped(
+            SyncPhase.device_youtube, video.id, video.title, video_index, len(videos), error_message, playlist
+        )
+    return MirrorPlaylist(
+        id=playlist.id,
+        title=playlist.title,
+        folder=folder,
+        playlist_hash=_calculate_playlist_hash(videos),
+        files=files,
+    )
+
+
+def _mirror_podcast(sources: Dict[str, str]) -> List[MirrorFile]:
+    """Segment files of every requested episode, episodes by date; missing episodes are reported and skipped."""
+    library = podcast_store.load_library()
+    episodes = sorted(load_episodes_to_sync(), key=lambda e: e.date)
+    files: List[MirrorFile] = []
+    for episode_index, episode in enumerate(episodes, start=1):
+        record = library.episodes.get(episode.id)
+        paths = _episode_segment_paths(record) if record and record.episode_dir else []
+        if record is None:
+            print(f"[Device Mirror] Episode {episode.id} not found in library, skipping")
+            error_message = "episode not found in library"
+        elif not record.episode_dir or not os.path.exists(record.episode_dir):
+            print(f"[Device Mirror] Episode directory does not exist: {record.episode_dir}, skipping")
+            error_message = f"episode directory missing: {record.episode_dir}"
+        elif not all(os.path.exists(path) for path in paths):
+            print(f"[Device Mirror] Segment files of episode {episode.id} are missing, skipping")
+            error_message = f"segment files missing in {record.episode_dir}"
+        else:
+            if record.segments:
+                hashes = [segment.blob_hash for segment in record.segments]
+            else:
+                hashes = [sha256_file(path) for path in paths]
+            for path, content_hash in zip(paths, hashes):
+                name = os.path.basename(path)
+                files.append(
+                    MirrorFile(
+                        name=name,
+                        size=os.path.getsize(path),
+                        content_hash=content_hash,
+                        item_id=episode.id,
+                        item_title=episode.title,
+                    )
+                )
+                sources[os.path.join(PODCAST_FOLDER_NAME, name)] = path
+            continue
+        _report_skipped(SyncPhase.device_podcast, episode.id, episode.title, episode_index, len(episodes), error_message)
+    return files
+
+
+def _folders(mirror: DeviceMirror) -> List[Tuple[str, List[MirrorFile]]]:
+    return [(playlist.folder, playlist.files) for playlist in mirror.playlists] + [
+        (PODCAST_FOLDER_NAME, mirror.podcast)
+    ]
+
+
+def _link_or_copy(source: str, destination: Path) -> None:
+    staged = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    try:
+        os.link(source, staged)
+    except OSError:
+        shutil.copyfile(source, staged)
+    os.replace(staged, destination)
+
+
+def _ensure_link(relative_path: str, file: MirrorFile, linked_hash: Optional[str], source: Optional[str]) -> bool:
+    """Point the mirror entry at the file's content; False if the content is nowhere to be found."""
+    destination = Path(config.device_mirror_path, relative_path)
+    if linked_hash == file.content_hash and destination.exists() and destination.stat().st_size == file.size:
+        return True
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if blob_store.has_blob(file.content_hash):
+        blob_store.link_blob(file.content_hash, destination)
+    elif source is not None and os.path.exists(source):
+        _link_or_copy(source, destination)
+    else:
+        print(f"[Device Mirror] No library file for {relative_path}, leaving it out")
+        return False
+    return True
+
+
+def _remove_stale(wanted: Set[str]) -> None:
+    root = config.device_mirror_path
+    for directory, dirnames, names in os.walk(root, topdown=False):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.relpath(path, root) not in wanted and path != _mirror_file_path():
+                os.remove(path)
+        for dirname in dirnames:
+            try:
+                os.rmdir(os.path.join(directory, dirname))
+            except OSError:
+                pass  # still holds files
+
+
+def load_device_mirror() -> Optional[DeviceMirror]:
+    """The last mirror built, or None if there is none (or it is unreadable)."""
+    try:
+        with open(_mirror_file_path(), "r", encoding="utf-8") as f:
+            return DeviceMirror.model_validate(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, ValidationError) as exc:
+        print(f"[Device Mirror] Ignoring unreadable {MIRROR_FILE_NAME}: {exc}")
+        return None
+
+
+def _save_device_mirror(mirror: DeviceMirror) -> None:
+    path = _mirror_file_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(mirror.model_dump_json(indent=2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def build_device_mirror(playlists: List[PlaylistInfo]) -> DeviceMirror:
+    """Bring the mirror up to date with the library and the current requests.
+
+    Playlists that are still requested but failed to resolve this run keep
+    their previous mirror entry, as they keep their device folder.
+    """
+    previous = load_device_mirror()
+    sources: Dict[str, str] = {}
+    library_videos = youtube_store.load_library().videos
+    mirror_playlists = [_mirror_playlist(playlist, library_videos, sources) for playlist in playlists]
+
+    requested_ids = [request.id.strip() for request in load_playlists_to_sync()]
+    resolved_ids = {playlist.id for playlist in playlists}
+    if previous is not None:
+        mirror_playlists += [
+            playlist
+            for playlist in previous.playlists
+            if playlist.id in requested_ids and playlist.id not in resolved_ids
+        ]
+    request_order = {playlist_id: index for index, playlist_id in enumerate(requested_ids)}
+    mirror_playlists.sort(key=lambda playlist: request_order.get(playlist.id, len(request_order)))
+
+    mirror = DeviceMirror(playlists=mirror_playlists, podcast=_mirror_podcast(sources))
+    os.makedirs(config.device_mirror_path, exist_ok=True)
+    linked = {
+        os.path.join(folder, file.name): file.content_hash
+        for folder, files in (_folders(previous) if previous else [])
+        for file in files
+    }
+    wanted: Set[str] = set()
+    for folder, files in _folders(mirror):
+        kept = []
+        for file in files:
+            relative_path = os.path.join(folder, file.name)
+            if _ensure_link(relative_path, file, linked.get(relative_path), sources.get(relative_path)):
+                kept.append(file)
+                wanted.add(relative_path)
+        files[:] = kept
+    _remove_stale(wanted)
+    _save_device_mirror(mirror)
+
+    file_count = sum(len(files) for _, files in _folders(mirror))
+    print(f"[Device Mirror] Device tree ready: {len(mirror.playlists)} playlists, {file_count} files")
+    return mirror
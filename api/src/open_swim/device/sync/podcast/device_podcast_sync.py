@@ -1,33 +1,49 @@
 import os
-import shutil
-import glob
-from typing import List, Set
+from collections import Counter
+from typing import Dict, List
 
 from open_swim.config import config
-from open_swim.device.sync.state import load_sync_state, save_sync_state
+from open_swim.device.sync.copy_engine import CopyProgress, DeviceCopier
+from open_swim.device.sync.manifest import (
+    DeviceCopyError,
+    PlacedFile,
+    adopt_existing_files,
+    apply_folder_plan,
+    plan_folder_sync,
+)
+from open_swim.device.sync.mirror import PODCAST_FOLDER_NAME, MirrorFile, mirror_targets
+from open_swim.device.sync.state import DeviceFileEntry, load_sync_state, save_sync_state
 from open_swim.messaging.models import SyncItemStatus, SyncPhase, SyncProgressMessage
 from open_swim.messaging.progress import get_progress_reporter
-from open_swim.media.podcast import store
-from open_swim.media.podcast.episodes_to_sync import load_episodes_to_sync
-from open_swim.media.podcast.models import EpisodeRequest
 
 
-def _get_episode_ids(episodes: List[EpisodeRequest]) -> Set[str]:
-    """Extract episode IDs from a list of episodes."""
-    return {episode.id for episode in episodes}
-
-
-def _delete_mp3_files(podcast_folder_path: str) -> None:
-    """Delete all MP3 files from the podcast folder."""
-    mp3_pattern = os.path.join(podcast_folder_path, "*.mp3")
-    mp3_files = glob.glob(mp3_pattern)
-    for mp3_file in mp3_files:
-        os.remove(mp3_file)
-        print(f"[Podcast Sync] Deleted: {os.path.basename(mp3_file)}")
+def _report_episode_progress(
+    status: SyncItemStatus,
+    episode: MirrorFile | None = None,
+    current_index: int | None = None,
+    total_count: int | None = None,
+    error_message: str | None = None,
+    copy_progress: CopyProgress | None = None,
+) -> None:
+    get_progress_reporter().report_progress(
+        SyncProgressMessage(
+            phase=SyncPhase.device_podcast,
+            status=status,
+            item_id=episode.item_id if episode else None,
+            item_title=episode.item_title if episode else None,
+            current_index=current_index,
+            total_count=total_count,
+            percentage=copy_progress.percentage if copy_progress else None,
+            bytes_copied=copy_progress.bytes_copied if copy_progress else None,
+            bytes_total=copy_progress.bytes_total if copy_progress else None,
+            bytes_per_second=copy_progress.bytes_per_second if copy_progress else None,
+            error_message=error_message,
+        )
+    )
 
 
-def sync_podcast_episodes_to_device() -> None:
-    """Sync podcast episodes from library to device."""
+def sync_podcast_episodes_to_device(files: List[MirrorFile]) -> None:
+    """Sync the podcast folder of the device mirror (segments in play order) to the device."""
     reporter = get_progress_reporter()
     device_sdcard_path = config.device_sd_path
 
@@ -53,7 +69,7 @@ def sync_podcast_episodes_to_device() -> None:
         )
         return
 
-    podcast_folder_path = os.path.join(device_sdcard_path, "podcast")
+    podcast_folder_path = os.path.join(device_sdcard_path, PODCAST_FOLDER_NAME)
     if not os.path.exists(podcast_folder_path):
         print(f"[Podcast Sync] Podcast folder does not exist: {podcast_folder_path}")
         reporter.report_progress(
@@ -65,8 +81,7 @@ def sync_podcast_episodes_to_device() -> None:
         )
         return
 
-    episodes_to_sync = load_episodes_to_sync()
-    if not episodes_to_sync:
+    if not files:
         print("[Podcast Sync] No episodes to sync")
         reporter.report_progress(
             SyncProgressMessage(
@@ -78,112 +93,83 @@ def sync_podcast_episodes_to_device() -> None:
         return
 
     state = load_sync_state(device_sdcard_path)
-    synced_episode_ids = set(state.podcasts.synced_episode_ids)
-    episodes_to_sync_ids = _get_episode_ids(episodes_to_sync)
-
-    if episodes_to_sync_ids == synced_episode_ids:
+    # First segment of each episode, in play order; carries the episode's id and title
+    episodes_by_id: Dict[str, MirrorFile] = {}
+    for file in files:
+        episodes_by_id.setdefault(file.item_id, file)
+    targets = mirror_targets(PODCAST_FOLDER_NAME, files)
+    if not state.podcasts.files and set(state.podcasts.synced_episode_ids) == set(episodes_by_id):
+        # Written in full by a sync that predates the manifest
+        state.podcasts.files = adopt_existing_files(podcast_folder_path, targets)
+    plan = plan_folder_sync(podcast_folder_path, state.podcasts.files, targets)
+
+    if plan.up_to_date:
         print("[Podcast Sync] Episodes already up to date on device. Skipping.")
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.device_podcast,
-                status=SyncItemStatus.skipped,
-                error_message="episodes already up to date on device",
-            )
+        _report_episode_progress(
+            SyncItemStatus.skipped, error_message="episodes already up to date on device"
         )
         return
 
-    print("[Podcast Sync] Episode list changed. Syncing to device...")
-    reporter.report_progress(
-        SyncProgressMessage(
-            phase=SyncPhase.device_podcast,
-            status=SyncItemStatus.started,
-            total_count=len(episodes_to_sync),
-        )
+    removed_episodes = {entry.item_id for entry in state.podcasts.files} - set(episodes_by_id)
+    print(
+        f"[Podcast Sync] Episode list changed. Syncing to device... (keep {len(plan.keep)}, "
+        f"move {len(plan.place) - len(plan.copies)}, copy {len(plan.copies)}, remove {len(plan.remove)}; "
+        f"{len(removed_episodes)} episodes removed)"
     )
+    _report_episode_progress(SyncItemStatus.started, total_count=len(episodes_by_id))
+
+    # Copy progress is reported per episode: segment n of the episode's segment count
+    episode_file_counts: Counter[str] = Counter()
+    episode_file_index: Dict[str, int] = {}
+    for target in targets:
+        episode_file_counts[target.item_id or ""] += 1
+        episode_file_index[target.name] = episode_file_counts[target.item_id or ""]
+
+    def commit(files: List[DeviceFileEntry]) -> None:
+        state.podcasts.files = files
+        save_sync_state(state, device_sdcard_path, quiet=True)
+
+    def on_copy(placed: PlacedFile) -> None:
+        target = placed.target
+        _report_episode_progress(
+            SyncItemStatus.copying,
+            episodes_by_id[target.item_id or ""],
+            current_index=episode_file_index[target.name],
+            total_count=episode_file_counts[target.item_id or ""],
+        )
+        print(f"[Podcast Sync] Copying: {target.name}")
 
-    _delete_mp3_files(podcast_folder_path)
-    library_info = store.load_library()
-    sorted_episodes = sorted(episodes_to_sync, key=lambda e: e.date)
-
-    for episode_index, episode in enumerate(sorted_episodes, start=1):
-        if episode.id not in library_info.episodes:
-            print(f"[Podcast Sync] Episode {episode.id} not found in library, skipping")
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.device_podcast,
-                    status=SyncItemStatus.skipped,
-                    item_id=episode.id,
-                    item_title=episode.title,
-                    current_index=episode_index,
-                    total_count=len(sorted_episodes),
-                    error_message="episode not found in library",
-                )
-            )
-            continue
-
-        episode_info = library_info.episodes[episode.id]
-        episode_dir = episode_info.episode_dir
-
-        if not episode_dir or not os.path.exists(episode_dir):
-            print(f"[Podcast Sync] Episode directory does not exist: {episode_dir}, skipping")
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.device_podcast,
-                    status=SyncItemStatus.skipped,
-                    item_id=episode.id,
-                    item_title=episode.title,
-                    current_index=episode_index,
-                    total_count=len(sorted_episodes),
-                    error_message=f"episode directory missing: {episode_dir}",
-                )
-            )
-            continue
-
-        mp3_pattern = os.path.join(episode_dir, "*.mp3")
-        mp3_files = sorted(glob.glob(mp3_pattern), key=lambda f: os.path.basename(f))
-
-        total_files = len(mp3_files)
-        for file_index, mp3_file in enumerate(mp3_files, start=1):
-            filename = os.path.basename(mp3_file)
-            destination_path = os.path.join(podcast_folder_path, filename)
-            try:
-                reporter.report_progress(
-                    SyncProgressMessage(
-                        phase=SyncPhase.device_podcast,
-                        status=SyncItemStatus.copying,
-                        item_id=episode.id,
-                        item_title=episode.title,
-                        current_index=file_index,
-                        total_count=total_files,
-                    )
-                )
-                shutil.copy2(mp3_file, destination_path)
-                print(f"[Podcast Sync] Copied: {filename}")
-            except Exception as e:
-                reporter.report_progress(
-                    SyncProgressMessage(
-                        phase=SyncPhase.device_podcast,
-                        status=SyncItemStatus.error,
-                        item_id=episode.id,
-                        item_title=episode.title,
-                        current_index=file_index,
-                        total_count=total_files,
-                        error_message=str(e),
-                    )
-                )
-                raise RuntimeError(
-                    f"[Podcast Sync] Failed to copy '{filename}' for episode '{episode.id}': {e}"
-                ) from e
-
-    state.podcasts.synced_episode_ids = list(episodes_to_sync_ids)
+    def on_bytes(progress: CopyProgress) -> None:
+        _report_episode_progress(
+            SyncItemStatus.copying, total_count=len(episodes_by_id), copy_progress=progress
+        )
+
+    copier = DeviceCopier(bytes_total=plan.bytes_to_copy, on_progress=on_bytes)
+    try:
+        apply_folder_plan(podcast_folder_path, plan, state.podcasts.files, commit, on_copy, copier=copier)
+    except DeviceCopyError as e:
+        _report_episode_progress(
+            SyncItemStatus.error,
+            episodes_by_id[e.target.item_id or ""],
+            current_index=episode_file_index[e.target.name],
+            total_count=episode_file_counts[e.target.item_id or ""],
+            error_message=str(e),
+        )
+        raise RuntimeError(
+            f"[Podcast Sync] Failed to copy '{e.target.name}' for episode '{e.target.item_id}': {e}"
+        ) from e
+
+    state.podcasts.synced_episode_ids = sorted(episode_file_counts)
     save_sync_state(state, device_sdcard_path)
 
-    print("[Podcast Sync] Sync completed")
-    reporter.report_progress(
-        SyncProgressMessage(
-            phase=SyncPhase.device_podcast,
-            status=SyncItemStatus.completed,
-            current_index=len(sorted_episodes),
-            total_count=len(sorted_episodes),
+    if copier.bytes_copied:
+        print(
+            f"[Podcast Sync] Copied {copier.bytes_copied / (1024 * 1024):.1f} MiB "
+            f"at {copier.bytes_per_second / (1024 * 1024):.1f} MiB/s"
         )
+    print("[Podcast Sync] Sync completed")
+    _report_episode_progress(
+        SyncItemStatus.completed,
+        current_index=len(episodes_by_id),
+        total_count=len(episodes_by_id),
     )
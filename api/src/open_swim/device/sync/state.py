@@ -7,6 +7,22 @@ from pydantic import BaseModel, Field
 from open_swim.config import config
 
 
+class DeviceFileEntry(BaseModel):
+    """A file committed to a device folder; `position` is its index in the folder's play order.
+
+    `content_hash` is the SHA-256 of the bytes streamed into the file when it
+    was copied (checked against the library hash), so later syncs trust the
+    file by size and manifest without reading it back. `item_id` is the video
+    or episode the file belongs to.
+    """
+
+    name: str
+    size: int
+    content_hash: str
+    position: int
+    item_id: Optional[str] = None
+
+
 class DevicePlaylistState(BaseModel):
     """State for a playlist mirrored to the device."""
 
@@ -14,12 +30,18 @@ class DevicePlaylistState(BaseModel):
     title: str
     playlist_hash: Optional[str] = None
     video_count: Optional[int] = None
+    files: List[DeviceFileEntry] = Field(default_factory=list)
 
 
 class DevicePodcastState(BaseModel):
     """State for podcasts mirrored to the device."""
 
     synced_episode_ids: List[str] = Field(default_factory=list)
+    files: List[DeviceFileEntry] = Field(default_factory=list)
+
+    def episode_files(self, episode_id: str) -> List[DeviceFileEntry]:
+        """Segment files of one episode on the device, in play order."""
+        return [entry for entry in self.files if entry.item_id == episode_id]
 
 
 class DeviceSyncState(BaseModel):
@@ -40,16 +62,30 @@ def load_sync_state(sd_card_path: str | None = None) -> DeviceSyncState:
     sync_json_path = _state_path(path)
     if not os.path.exists(sync_json_path):
         return DeviceSyncState()
-    with open(sync_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return DeviceSyncState(**data)
+    try:
+        with open(sync_json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return DeviceSyncState(**data)
+    except (ValueError, OSError) as exc:
+        # Without a manifest every file on the device is rewritten, which is safe
+        print(f"[Device Sync] Ignoring unreadable sync state {sync_json_path}: {exc}")
+        return DeviceSyncState()
+
 
+def save_sync_state(state: DeviceSyncState, sd_card_path: str | None = None, quiet: bool = False) -> None:
+    """Persist device sync state to SD card.
 
-def save_sync_state(state: DeviceSyncState, sd_card_path: str | None = None) -> None:
-    """Persist device sync state to SD card."""
+    The state is written to a temporary file, fsynced and renamed over the old one,
+    so it can be saved after every committed file and survive the card being pulled.
+    """
     path = sd_card_path or config.device_sd_path
     os.makedirs(path, exist_ok=True)
     sync_json_path = _state_path(path)
-    with open(sync_json_path, "w", encoding="utf-8") as f:
+    tmp_path = sync_json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(state.model_dump(), f, indent=2, ensure_ascii=False)
-    print(f"[Device Sync] Saved sync state to {sync_json_path}")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, sync_json_path)
+    if not quiet:
+        print(f"[Device Sync] Saved sync state to {sync_json_path}")
@@ -3,36 +3,43 @@ import shutil
 from typing import List
 
 from open_swim.config import config
+from open_swim.device.sync.manifest import staging_path
+from open_swim.device.sync.mirror import MirrorPlaylist
 from open_swim.device.sync.state import DevicePlaylistState, load_sync_state, save_sync_state
-from open_swim.device.sync.youtube.sanitize import sanitize_playlist_title
-from open_swim.media.youtube.playlists import PlaylistInfo
+from open_swim.media.youtube.playlists_to_sync import load_playlists_to_sync
 
 
-def sync_playlists_directories(playlists_to_sync: List[PlaylistInfo]) -> None:
+def sync_playlists_directories(playlists_to_sync: List[MirrorPlaylist]) -> None:
     """Ensure playlist directories exist on device and remove stale ones."""
     _prepare_device_directories(playlists_to_sync=playlists_to_sync)
 
 
-def _prepare_device_directories(playlists_to_sync: List[PlaylistInfo]) -> None:
+def _prepare_device_directories(playlists_to_sync: List[MirrorPlaylist]) -> None:
     """Ensure requested playlists have directories and remove ones no longer requested."""
     sd_card_path = config.device_sd_path
     state = load_sync_state(sd_card_path)
 
     playlists_to_sync_by_id = {playlist.id: playlist for playlist in playlists_to_sync}
     existing_playlists_by_id = {playlist.id: playlist for playlist in state.playlists}
+    # Playlists that are still requested but failed to resolve this run keep their folders
+    requested_ids = {request.id.strip() for request in load_playlists_to_sync()}
 
     # Remove any playlist folders that are no longer requested
     for existing_playlist in list(state.playlists):
-        if existing_playlist.id in playlists_to_sync_by_id:
+        if existing_playlist.id in playlists_to_sync_by_id or existing_playlist.id in requested_ids:
             continue
         playlist_path = os.path.join(sd_card_path, existing_playlist.title)
         if os.path.exists(playlist_path):
             shutil.rmtree(playlist_path)
             print(f"[Device Sync] Removed playlist folder no longer requested: {playlist_path}")
 
-    updated_playlists: List[DevicePlaylistState] = []
-    for playlist in playlists_to_sync:  # type: PlaylistInfo
-        sanitized_title = sanitize_playlist_title(playlist.title)
+    updated_playlists: List[DevicePlaylistState] = [
+        playlist
+        for playlist in state.playlists
+        if playlist.id in requested_ids and playlist.id not in playlists_to_sync_by_id
+    ]
+    for playlist in playlists_to_sync:  # type: MirrorPlaylist
+        sanitized_title = playlist.folder
         playlist_path = os.path.join(sd_card_path, sanitized_title)
 
         if playlist.id not in existing_playlists_by_id and not os.path.exists(playlist_path):
@@ -42,18 +49,34 @@ def _prepare_device_directories(playlists_to_sync: List[PlaylistInfo]) -> None:
         existing = existing_playlists_by_id.get(playlist.id)
         if existing and existing.title != sanitized_title:
             old_path = os.path.join(sd_card_path, existing.title)
-            if os.path.exists(old_path):
-                shutil.rmtree(old_path)
-                print(f"[Device Sync] Removed renamed playlist folder: {old_path}")
+            if os.path.isdir(old_path) and not os.path.exists(playlist_path):
+                # Manifest entries are keyed by file name and a renamed FAT directory keeps its entry order
+                os.rename(old_path, playlist_path)
+                _move_staging(old_path, playlist_path)
+                print(f"[Device Sync] Renamed playlist folder: {old_path} -> {playlist_path}")
+            else:
+                if os.path.exists(old_path):
+                    shutil.rmtree(old_path)
+                    print(f"[Device Sync] Removed renamed playlist folder: {old_path}")
+                existing = None  # the manifest described the removed folder
+                os.makedirs(playlist_path, exist_ok=True)
 
         updated_playlists.append(
-            DevicePlaylistState(
-                id=playlist.id,
-                title=sanitized_title,
-                playlist_hash=getattr(existing, "playlist_hash", None),
-                video_count=getattr(existing, "video_count", None),
-            )
+            existing.model_copy(update={"title": sanitized_title})
+            if existing
+            else DevicePlaylistState(id=playlist.id, title=sanitized_title)
         )
 
     state.playlists = updated_playlists
     save_sync_state(state, sd_card_path)
+
+
+def _move_staging(old_path: str, new_path: str) -> None:
+    """Carry files a cut-short sync left in the old folder's staging area over to the new one."""
+    old_staging, new_staging = staging_path(old_path), staging_path(new_path)
+    if not os.path.isdir(old_staging):
+        return
+    if os.path.exists(new_staging):
+        shutil.rmtree(old_staging)  # the planner treats files missing from staging as not on the card
+    else:
+        os.rename(old_staging, new_staging)
@@ -0,0 +1,111 @@
+"""Content-addressed storage for rendered library audio.
+
+Every finished YouTube track and podcast segment is stored once, as
+`LIBRARY_PATH/blobs/<hash[:2]>/<sha256>.mp3`. The readable names under
+`youtube/` and `podcasts/<episode>/` are hard links to those objects (copies on
+filesystems without hard links), and the library records keep the hashes. That
+way identical renders share one object, a renamed title only moves a link, and
+any file can be checked against the hash its record expects.
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterable, Set
+
+from open_swim.config import config
+from open_swim.media.hashing import sha256_file
+
+
+def blob_path(blob_hash: str) -> Path:
+    """Location of the object with the given SHA-256 hex digest."""
+    return Path(config.blobs_path) / blob_hash[:2] / f"{blob_hash}.mp3"
+
+
+def _staging_name(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    """Atomically place `source` at `destination` as a hard link, or a copy if links are unsupported."""
+    staged = _staging_name(destination)
+    try:
+        os.link(source, staged)
+    except OSError:
+        shutil.copyfile(source, staged)
+    os.replace(staged, destination)
+
+
+def store_blob(source_path: Path) -> str:
+    """Add a file to the blob store and return its hash; identical content is stored once."""
+    blob_hash = sha256_file(str(source_path))
+    destination = blob_path(blob_hash)
+    if not destination.exists():
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(Path(source_path), destination)
+    return blob_hash
+
+
+def link_blob(blob_hash: str, destination: Path) -> Path:
+    """Give a blob the readable name `destination`, replacing whatever file had that name."""
+    source = blob_path(blob_hash)
+    if not source.exists():
+        raise FileNotFoundError(f"Blob {blob_hash} is missing from {config.blobs_path}")
+    if destination.exists() and os.path.samefile(source, destination):
+        return destination
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    _link_or_copy(source, destination)
+    return destination
+
+
+def adopt_file(path: Path) -> str:
+    """Move an existing library file under blob management, keeping its name; return its hash."""
+    blob_hash = store_blob(path)
+    link_blob(blob_hash, path)
+    return blob_hash
+
+
+def has_blob(blob_hash: str) -> bool:
+    return blob_path(blob_hash).exists()
+
+
+def verify_blob(blob_hash: str) -> bool:
+    """Re-hash a blob and report whether it still matches its name."""
+    path = blob_path(blob_hash)
+    if not path.exists():
+        return False
+    if sha256_file(str(path)) == blob_hash:
+        return True
+    print(f"[Blob Store] Blob {blob_hash} is corrupt, removing it")
+    path.unlink()
+    return False
+
+
+def restore_link(blob_hash: str, path: Path, verify: bool = False) -> bool:
+    """Make sure `path` holds the blob, relinking it if the readable name went missing.
+
+    Returns False if the blob itself is missing (or, with `verify`, corrupt),
+    in which case the file has to be produced again.
+    """
+    if not has_blob(blob_hash) or (verify and not verify_blob(blob_hash)):
+        return False
+    if not path.exists() or path.stat().st_size != blob_path(blob_hash).stat().st_size:
+        link_blob(blob_hash, path)
+    return True
+
+
+def remove_unreferenced_blobs(referenced: Iterable[str]) -> int:
+    """Delete blobs no library record points to; return how many were removed."""
+    keep: Set[str] = set(referenced)
+    root = Path(config.blobs_path)
+    if not root.exists():
+        return 0
+    removed = 0
+    for path in root.glob("*/*.mp3"):
+        if path.stem not in keep:
+            path.unlink()
+            removed += 1
+    if removed:
+        print(f"[Blob Store] Removed {removed} unreferenced blobs")
+    return removed
@@ -0,0 +1,336 @@
+"""Frame-level MP3 parsing and splicing.
+
+Joining an intro, a silence clip and a podcast segment only needs their MPEG
+audio frames written back to back when all streams share the same MPEG version,
+sample rate, channel count and bitrate. That turns the merge into a sequential
+file copy instead of a full decode and libmp3lame re-encode.
+
+Tags are handled on the way through: ID3v2 is kept from one input only, ID3v1
+and APE trailers are dropped, per-input Xing/Info/VBRI frames are dropped and a
+fresh Info frame with the spliced frame and byte counts is written. Frames whose
+bit reservoir reaches back into a previous input are rewritten as silent frames
+so the decoder never reads another stream's bytes as main data.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_BITRATES_KBPS = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    25: [11025, 12000, 8000],
+}
+_VERSIONS = {0: 25, 2: 2, 3: 1}
+_CHANNEL_MODE_MONO = 3
+_INFO_FLAGS_FRAMES_AND_BYTES = 0x3
+
+
+class Mp3SpliceError(Exception):
+    """Raised when streams cannot be spliced at frame level."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class FrameHeader:
+    """A parsed MPEG-1/2/2.5 Layer III frame header."""
+
+    raw: bytes
+    version: int
+    protected: bool
+    bitrate_kbps: int
+    sample_rate: int
+    padding: int
+    channel_mode: int
+
+    @property
+    def channels(self) -> int:
+        return 1 if self.channel_mode == _CHANNEL_MODE_MONO else 2
+
+    @property
+    def frame_length(self) -> int:
+        coefficient = 144 if self.version == 1 else 72
+        return coefficient * self.bitrate_kbps * 1000 // self.sample_rate + self.padding
+
+    @property
+    def samples_per_frame(self) -> int:
+        return 1152 if self.version == 1 else 576
+
+    @property
+    def side_info_offset(self) -> int:
+        return 4 + (2 if self.protected else 0)
+
+    @property
+    def side_info_length(self) -> int:
+        if self.version == 1:
+            return 17 if self.channels == 1 else 32
+        return 9 if self.channels == 1 else 17
+
+    @property
+    def main_data_length(self) -> int:
+        return self.frame_length - self.side_info_offset - self.side_info_length
+
+
+@dataclass
+class Mp3Stream:
+    """Audio frames of one MP3 file, with tags and per-file VBR headers stripped."""
+
+    data: bytes
+    id3v2: bytes
+    frames: List[Tuple[int, FrameHeader]]
+
+    @property
+    def audio_start(self) -> int:
+        return self.frames[0][0] if self.frames else 0
+
+    @property
+    def audio_end(self) -> int:
+        if not self.frames:
+            return 0
+        offset, header = self.frames[-1]
+        return offset + header.frame_length
+
+
+@dataclass(frozen=True)
+class Mp3Info:
+    """Stream parameters of an MP3 file."""
+
+    version: int
+    sample_rate: int
+    channels: int
+    bitrate_kbps: int
+    constant_bitrate: bool
+    frame_count: int
+    duration_seconds: float
+
+
+def parse_frame_header(data: bytes, offset: int) -> Optional[FrameHeader]:
+    """Parse a Layer III frame header at `offset`, or return None if there is none."""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset : offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONS.get((b1 >> 3) & 0x3)
+    layer_bits = (b1 >> 1) & 0x3
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x3
+    if version is None or layer_bits != 0x1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    return FrameHeader(
+        raw=bytes(data[offset : offset + 4]),
+        version=version,
+        protected=not (b1 & 0x1),
+        bitrate_kbps=_BITRATES_KBPS[1 if version == 1 else 2][bitrate_index],
+        sample_rate=_SAMPLE_RATES[version][sample_rate_index],
+        padding=(b2 >> 1) & 0x1,
+        channel_mode=b3 >> 6,
+    )
+
+
+def _id3v2_length(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_vbr_header_frame(data: bytes, offset: int, header: FrameHeader) -> bool:
+    tag_offset = offset + header.side_info_offset + header.side_info_length
+    if data[tag_offset : tag_offset + 4] in (b"Xing", b"Info"):
+        return True
+    return data[offset + 36 : offset + 40] == b"VBRI"
+
+
+def _is_trailer(data: bytes, offset: int) -> bool:
+    remaining = len(data) - offset
+    if remaining == 128 and data[offset : offset + 3] == b"TAG":
+        return True
+    return data[offset : offset + 8] in (b"APETAGEX", b"LYRICSBE")
+
+
+def read_mp3_stream(path: Path) -> Mp3Stream:
+    """Read an MP3 file and index its audio frames.
+
+    Raises Mp3SpliceError if the file is not a clean sequence of Layer III frames.
+    """
+    return _index_frames(Path(path).read_bytes(), str(path))
+
+
+def _index_frames(data: bytes, source: str) -> Mp3Stream:
+    id3v2_length = _id3v2_length(data)
+    offset = id3v2_length
+    frames: List[Tuple[int, FrameHeader]] = []
+    while offset < len(data):
+        header = parse_frame_header(data, offset)
+        if header is None:
+            if _is_trailer(data, offset) or len(data) - offset < 4:
+                break
+            raise Mp3SpliceError(f"{source}: lost frame sync at byte {offset}")
+        if offset + header.frame_length > len(data):
+            break  # truncated final frame
+        if not frames and _is_vbr_header_frame(data, offset, header):
+            offset += header.frame_length
+            continue
+        frames.append((offset, header))
+        offset += header.frame_length
+    if not frames:
+        raise Mp3SpliceError(f"{source}: no MPEG audio frames found")
+    return Mp3Stream(data=data, id3v2=data[:id3v2_length], frames=frames)
+
+
+def probe_mp3(path: Path) -> Mp3Info:
+    """Return stream parameters (from frame headers) and duration of an MP3 file."""
+    return _stream_info(read_mp3_stream(path))
+
+
+def probe_mp3_prefix(data: bytes, source: str = "stream") -> Mp3Info:
+    """Like `probe_mp3`, for the first bytes of an MP3 that is still arriving.
+
+    The duration and `constant_bitrate` only cover the frames in `data`.
+    """
+    return _stream_info(_index_frames(data, source))
+
+
+def _stream_info(stream: Mp3Stream) -> Mp3Info:
+    first = stream.frames[0][1]
+    bitrates = {header.bitrate_kbps for _, header in stream.frames}
+    frame_count = len(stream.frames)
+    return Mp3Info(
+        version=first.version,
+        sample_rate=first.sample_rate,
+        channels=first.channels,
+        bitrate_kbps=first.bitrate_kbps,
+        constant_bitrate=len(bitrates) == 1,
+        frame_count=frame_count,
+        duration_seconds=frame_count * first.samples_per_frame / first.sample_rate,
+    )
+
+
+def _check_compatible(streams: Sequence[Mp3Stream], paths: Sequence[Path]) -> FrameHeader:
+    reference = streams[0].frames[0][1]
+    for stream, path in zip(streams, paths):
+        for _, header in stream.frames:
+            if (
+                header.version != reference.version
+                or header.sample_rate != reference.sample_rate
+                or header.channels != reference.channels
+                or header.bitrate_kbps != reference.bitrate_kbps
+            ):
+                raise Mp3SpliceError(
+                    f"{path}: {header.version}/{header.sample_rate}Hz/{header.channels}ch/"
+                    f"{header.bitrate_kbps}k does not match {reference.version}/"
+                    f"{reference.sample_rate}Hz/{reference.channels}ch/{reference.bitrate_kbps}k"
+                )
+    return reference
+
+
+def _main_data_begin(data: bytes, offset: int, header: FrameHeader) -> int:
+    side = offset + header.side_info_offset
+    if header.version == 1:
+        return (data[side] << 1) | (data[side + 1] >> 7)
+    return data[side]
+
+
+def _crc16(data: bytes) -> int:
+    crc = 0xFFFF
+    for byte in data:
+        for bit in range(7, -1, -1):
+            carry = ((crc >> 15) & 1) ^ ((byte >> bit) & 1)
+            crc = (crc << 1) & 0xFFFF
+            if carry:
+                crc ^= 0x8005
+    return crc
+
+
+def _silenced_frame(data: bytes, offset: int, header: FrameHeader) -> bytes:
+    """Zero the side info (no main data, zero gain) while keeping the main data bytes.
+
+    The frame then decodes to silence, and later frames whose reservoir points
+    into its main data region still find their bytes.
+    """
+    frame = bytearray(data[offset : offset + header.frame_length])
+    side_start = header.side_info_offset
+    frame[side_start : side_start + header.side_info_length] = bytes(header.side_info_length)
+    if header.protected:
+        crc = _crc16(bytes(frame[2:4]) + bytes(frame[side_start : side_start + header.side_info_length]))
+        frame[4:6] = crc.to_bytes(2, "big")
+    return bytes(frame)
+
+
+def _reservoir_fixups(stream: Mp3Stream) -> Dict[int, bytes]:
+    """Silence leading frames whose main data starts before this stream's first frame."""
+    fixups: Dict[int, bytes] = {}
+    available = 0
+    for index, (offset, header) in enumerate(stream.frames):
+        if available >= 511:
+            break
+        if _main_data_begin(stream.data, offset, header) > available:
+            fixups[index] = _silenced_frame(stream.data, offset, header)
+        available += header.main_data_length
+    return fixups
+
+
+def _info_frame(reference: FrameHeader, frame_count: int, audio_bytes: int) -> bytes:
+    """Build a CBR "Info" frame carrying the total frame and byte counts."""
+    b1 = reference.raw[1] | 0x1  # no CRC
+    b2 = reference.raw[2] & ~0x2  # no padding
+    header_bytes = bytes([0xFF, b1, b2, reference.raw[3]])
+    header = FrameHeader(
+        raw=header_bytes,
+        version=reference.version,
+        protected=False,
+        bitrate_kbps=reference.bitrate_kbps,
+        sample_rate=reference.sample_rate,
+        padding=0,
+        channel_mode=reference.channel_mode,
+    )
+    tag_offset = header.side_info_offset + header.side_info_length
+    if tag_offset + 16 > header.frame_length:
+        return b""
+    frame = bytearray(header.frame_length)
+    frame[0:4] = header_bytes
+    total_bytes = audio_bytes + header.frame_length
+    frame[tag_offset : tag_offset + 16] = (
+        b"Info"
+        + _INFO_FLAGS_FRAMES_AND_BYTES.to_bytes(4, "big")
+        + (frame_count + 1).to_bytes(4, "big")
+        + total_bytes.to_bytes(4, "big")
+    )
+    return bytes(frame)
+
+
+def splice_mp3(inputs: Sequence[Path], output_path: Path, keep_tags_from: int = -1) -> Path:
+    """Concatenate MP3 files at frame boundaries without re-encoding.
+
+    `keep_tags_from` selects the input whose ID3v2 tag is written to the output.
+    Raises Mp3SpliceError when the inputs' parameters differ; callers fall back
+    to an ffmpeg re-encode in that case.
+    """
+    if not inputs:
+        raise Mp3SpliceError("No inputs to splice")
+    streams = [read_mp3_stream(path) for path in inputs]
+    reference = _check_compatible(streams, inputs)
+
+    frame_count = sum(len(stream.frames) for stream in streams)
+    audio_bytes = sum(stream.audio_end - stream.audio_start for stream in streams)
+
+    with open(output_path, "wb") as out:
+        out.write(streams[keep_tags_from].id3v2)
+        out.write(_info_frame(reference, frame_count, audio_bytes))
+        for stream in streams:
+            view = memoryview(stream.data)
+            position = stream.audio_start
+            for index, replacement in sorted(_reservoir_fixups(stream).items()):
+                offset, _ = stream.frames[index]
+                out.write(view[position:offset])
+                out.write(replacement)
+                position = offset + len(replacement)
+            out.write(view[position : stream.audio_end])
+    return output_path
@@ -0,0 +1,93 @@
+"""Long-lived Piper synthesis engine.
+
+Loading the ONNX voice takes seconds on a Raspberry Pi, so the engine loads it
+once through the `piper-tts` library and reuses it for every utterance. When the
+library (or the model) cannot be loaded it falls back to running `PIPER_CMD`.
+"""
+
+import importlib
+import subprocess
+import threading
+import wave
+from pathlib import Path
+from typing import Any, Optional, Sequence, Tuple
+
+from open_swim.config import config
+
+
+class PiperEngine:
+    """Synthesizes utterances to WAV files with a voice model loaded once."""
+
+    def __init__(self, model_path: str) -> None:
+        self.model_path = model_path
+        self._voice: Optional[Any] = None
+        self._in_process_available = config.piper_in_process
+        self._lock = threading.Lock()
+
+    def _load_voice(self) -> Optional[Any]:
+        if self._voice is not None or not self._in_process_available:
+            return self._voice
+        try:
+            piper_voice = importlib.import_module("piper.voice")
+            self._voice = piper_voice.PiperVoice.load(self.model_path)
+            print(f"[TTS] Loaded Piper voice in-process: {self.model_path}")
+        except Exception as exc:
+            print(f"[TTS] In-process Piper unavailable, falling back to {config.piper_cmd}: {exc}")
+            self._in_process_available = False
+        return self._voice
+
+    def _synthesize_in_process(self, voice: Any, text: str, wav_path: Path) -> None:
+        with wave.open(str(wav_path), "wb") as wav_file:
+            if hasattr(voice, "synthesize_wav"):
+                voice.synthesize_wav(text, wav_file)
+            else:  # piper-tts < 1.3 writes WAV from synthesize()
+                voice.synthesize(text, wav_file)
+
+    def _synthesize_subprocess(self, text: str, wav_path: Path) -> None:
+        piper_cmd_parts = config.piper_cmd.split()
+        cmd = [
+            *piper_cmd_parts,
+            "-m",
+            self.model_path,
+            "-f",
+            str(wav_path),
+            "--",
+            text,
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
+
+    def synthesize(self, text: str, wav_path: Path) -> None:
+        """Write `text` as speech to `wav_path`."""
+        with self._lock:
+            voice = self._load_voice()
+            if voice is not None:
+                try:
+                    self._synthesize_in_process(voice, text, wav_path)
+                    return
+                except Exception as exc:
+                    print(f"[TTS] In-process Piper failed, falling back to {config.piper_cmd}: {exc}")
+                    self._voice = None
+                    self._in_process_available = False
+        self._synthesize_subprocess(text, wav_path)
+
+    def synthesize_batch(self, utterances: Sequence[Tuple[str, Path]]) -> None:
+        """Synthesize several (text, wav_path) utterances with the loaded voice.
+
+        The lock is taken per utterance so a concurrent single request is not
+        held up behind a whole batch.
+        """
+        for text, wav_path in utterances:
+            self.synthesize(text, wav_path)
+
+
+_engine: Optional[PiperEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_piper_engine() -> PiperEngine:
+    """Return the process-wide Piper engine for the configured voice model."""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.model_path != config.piper_voice_model_path:
+            _engine = PiperEngine(config.piper_voice_model_path)
+        return _engine
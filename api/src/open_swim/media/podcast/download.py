@@ -0,0 +1,236 @@
+"""Resumable HTTP downloads of podcast episodes.
+
+Downloads go to `LIBRARY_PATH/podcasts/.partial/<episode_id>-<url hash>.part`
+next to a `.json` sidecar that records the validator (ETag or Last-Modified)
+and expected size sent by the server. A retry after a dropped connection asks
+for the remaining bytes with `Range` + `If-Range`; if the resource changed the
+server answers with the full body and the download restarts from byte zero.
+A partial response that does not start where the part file ends is never
+written: the partial download is dropped and the episode requested in full.
+The same happens on a 416 unless the part file already holds every byte.
+A finished download is checked against the expected size and renamed to
+`.mp3`, where it stays until the episode is processed.
+
+All downloads share one keep-alive `requests.Session` whose connection pool
+is sized for PODCAST_DOWNLOAD_WORKERS concurrent downloads.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from open_swim.config import config
+from open_swim.media.podcast.models import EpisodeRequest
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+_UNSATISFIED_RANGE = re.compile(r"bytes \*/(\d+)")
+
+
+class DownloadError(Exception):
+    """Raised when a download ends with fewer or more bytes than the server announced."""
+
+    pass
+
+
+class PartialDownload(BaseModel):
+    """Sidecar metadata of an in-progress download."""
+
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    total_bytes: Optional[int] = None
+
+    @property
+    def validator(self) -> Optional[str]:
+        """Value for If-Range: a strong ETag, else Last-Modified."""
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Return the shared pooled session used for episode downloads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            pool_size = max(1, config.podcast_download_workers)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _partial_dir() -> Path:
+    return Path(config.podcasts_library_path) / ".partial"
+
+
+def _download_key(episode_id: str, url: str) -> str:
+    safe_id = re.sub(r"[^\w-]", "_", episode_id)
+    return f"{safe_id}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _paths(episode_id: str, url: str) -> tuple[Path, Path, Path]:
+    base = _partial_dir() / _download_key(episode_id, url)
+    return base.with_suffix(".part"), base.with_suffix(".json"), base.with_suffix(".mp3")
+
+
+def _load_meta(meta_path: Path, url: str) -> Optional[PartialDownload]:
+    if not meta_path.exists():
+        return None
+    try:
+        meta = PartialDownload.model_validate_json(meta_path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"[Podcast Download] Ignoring unreadable download metadata {meta_path}: {exc}")
+        return None
+    return meta if meta.url == url else None
+
+
+def _save_meta(meta_path: Path, meta: PartialDownload) -> None:
+    tmp_path = meta_path.with_name(f".{meta_path.name}.tmp")
+    tmp_path.write_text(meta.model_dump_json(), encoding="utf-8")
+    os.replace(tmp_path, meta_path)
+
+
+def _meta_from_response(url: str, response: requests.Response, total_bytes: Optional[int]) -> PartialDownload:
+    return PartialDownload(
+        url=url,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        total_bytes=total_bytes,
+    )
+
+
+def _content_length(response: requests.Response) -> Optional[int]:
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None  # the length is of the encoded body, not of the bytes written
+    value = response.headers.get("Content-Length")
+    return int(value) if value and value.isdigit() else None
+
+
+def download_episode(episode: EpisodeRequest) -> Path:
+    """Download an episode, resuming a previous partial download when possible.
+
+    Returns the path of the complete file. Raises requests exceptions or
+    DownloadError on failure (including a partial response to a request
+    without `Range`); the partial file is kept for the next attempt.
+    """
+    url = episode.download_url
+    part_path, meta_path, done_path = _paths(episode.id, url)
+    if done_path.exists():
+        print(f"[Podcast Download] Using completed download {done_path}")
+        return done_path
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+
+    meta = _load_meta(meta_path, url)
+    offset = part_path.stat().st_size if meta and part_path.exists() else 0
+    headers: Dict[str, str] = {}
+    if offset and meta and meta.validator:
+        headers = {"Range": f"bytes={offset}-", "If-Range": meta.validator}
+    else:
+        offset = 0
+
+    response = get_http_session().get(url, headers=headers, stream=True, timeout=30)
+    with response:
+        if response.status_code == 416 and headers and meta:
+            unsatisfied = _UNSATISFIED_RANGE.match(response.headers.get("Content-Range", ""))
+            if (int(unsatisfied.group(1)) if unsatisfied else meta.total_bytes) == offset:
+                # Everything was already received before the connection dropped.
+                return _finish(part_path, meta_path, done_path, offset)
+            part_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            print(f"[Podcast Download] {url} cannot resume at byte {offset}; restarting")
+            meta = None
+        else:
+            response.raise_for_status()
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status_code != 206:
+                if offset:
+                    print(f"[Podcast Download] {url} changed or cannot be resumed; restarting")
+                meta = _meta_from_response(url, response, _content_length(response))
+                _save_meta(meta_path, meta)
+                _write_body(response, part_path, "wb")
+            elif headers and meta and match and int(match.group(1)) == offset:
+                print(f"[Podcast Download] Resuming {url} at byte {offset}")
+                if match.group(3) != "*":
+                    meta.total_bytes = int(match.group(3))
+                _save_meta(meta_path, meta)
+                _write_body(response, part_path, "ab")
+            else:
+                # A range that does not continue the part file would pass the size check with bytes missing
+                part_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                if not headers:
+                    raise DownloadError(f"{url} answered a full request with a partial response")
+                print(f"[Podcast Download] {url} sent a range other than requested; restarting")
+                meta = None
+    if meta is None:
+        # Without the sidecar the next request carries no Range header
+        return download_episode(episode)
+    return _finish(part_path, meta_path, done_path, meta.total_bytes)
+
+
+def _write_body(response: requests.Response, part_path: Path, mode: str) -> None:
+    with open(part_path, mode) as f:
+        for chunk in response.iter_content(chunk_size=config.podcast_download_chunk_bytes):
+            f.write(chunk)
+
+
+def save_partial_download(episode: EpisodeRequest, response: requests.Response, prefix: bytes) -> None:
+    """Keep the first bytes of a full (200) response so `download_episode` resumes after them."""
+    url = episode.download_url
+    part_path, meta_path, _ = _paths(episode.id, url)
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    meta = _meta_from_response(url, response, _content_length(response))
+    if not prefix or not meta.validator:
+        return
+    part_path.write_bytes(prefix)
+    _save_meta(meta_path, meta)
+
+
+def _finish(part_path: Path, meta_path: Path, done_path: Path, total_bytes: Optional[int]) -> Path:
+    size = part_path.stat().st_size
+    if total_bytes is not None and size != total_bytes:
+        if size > total_bytes:
+            part_path.unlink()
+            meta_path.unlink(missing_ok=True)
+        raise DownloadError(f"Downloaded {size} of {total_bytes} bytes for {done_path.stem}")
+    os.replace(part_path, done_path)
+    meta_path.unlink(missing_ok=True)
+    return done_path
+
+
+def has_download(episode: EpisodeRequest) -> bool:
+    """True if a completed or resumable partial download of the episode exists."""
+    part_path, meta_path, done_path = _paths(episode.id, episode.download_url)
+    return done_path.exists() or (part_path.exists() and meta_path.exists())
+
+
+def discard_download(episode: EpisodeRequest) -> None:
+    """Delete the downloaded (or partial) file of an episode."""
+    for path in _paths(episode.id, episode.download_url):
+        path.unlink(missing_ok=True)
+
+
+def prune_downloads(episodes: Iterable[EpisodeRequest]) -> None:
+    """Delete partial and completed downloads of episodes that are no longer requested."""
+    directory = _partial_dir()
+    if not directory.exists():
+        return
+    keep: Set[str] = {_download_key(episode.id, episode.download_url) for episode in episodes}
+    for path in directory.iterdir():
+        if path.stem not in keep and not path.name.startswith("."):
+            print(f"[Podcast Download] Removing stale download {path}")
+            path.unlink(missing_ok=True)
@@ -1,127 +1,254 @@
-import re
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
 from open_swim.config import config
+from open_swim.media.mp3_splice import Mp3SpliceError, probe_mp3, splice_mp3
+from open_swim.media.tts import MP3_128K, ClipEncoding, synthesize_speech_batch
 from open_swim.messaging.models import SyncItemStatus, SyncPhase, SyncProgressMessage
 from open_swim.messaging.progress import get_progress_reporter
 from open_swim.media.podcast.models import EpisodeRequest
+from open_swim.media.podcast.render import (
+    SEGMENT_SECONDS,
+    probe_source_audio,
+    render_episode_segments,
+    segment_count,
+    segment_file_name,
+)
+
+_segment_pool: Optional[ThreadPoolExecutor] = None
+_segment_pool_lock = threading.Lock()
 
 
 def get_episode_segments(episode: EpisodeRequest, episode_path: Path, tmp_path: Path) -> List[Path]:
-    """Split a podcast episode, generate intros, and merge segments."""
-    reporter = get_progress_reporter()
+    """Turn a downloaded episode into final segment files with spoken intros.
+
+    PODCAST_RENDER_MODE selects how:
+    - `splice`: split with stream copy, then splice intro + silence + segment at
+      MP3 frame level (re-encoding only segments whose parameters differ).
+    - `graph`: decode and encode the whole episode once in a single ffmpeg filter
+      graph that also inserts the intros (`render_episode_segments`).
+    - `auto` (default): split first; constant-bitrate sources are spliced without
+      re-encoding, anything else is rendered in one graph pass instead of one
+      re-encode per segment.
+    """
+    if config.podcast_render_mode == "graph":
+        return _render_episode_in_one_pass(episode=episode, episode_path=episode_path, tmp_path=tmp_path)
+
     print("Splitting podcast into 10-minute segments...")
     segment_paths = _split_podcast_episode(episode_path=episode_path, output_dir=tmp_path)
+    # Encode intros and silence like the segments so they can be spliced without re-encoding
+    splice_encoding = _splice_encoding_for_segment(segment_paths[0]) if segment_paths else None
+    if config.podcast_render_mode == "auto" and splice_encoding is None:
+        print("Segments cannot be spliced, rendering the episode in one pass instead")
+        for segment_path in segment_paths:
+            segment_path.unlink()
+        return _render_episode_in_one_pass(episode=episode, episode_path=episode_path, tmp_path=tmp_path)
+    return _splice_episode_segments(
+        episode=episode,
+        segment_paths=segment_paths,
+        tmp_path=tmp_path,
+        clip_encoding=splice_encoding or MP3_128K,
+    )
 
-    total_segments = len(segment_paths)
-    print(f"Processing {total_segments} segments...")
-    final_segments: List[Path] = []
-    for index, segment_path in enumerate(segment_paths, start=1):
-        print(f"Processing segment {index} of {total_segments}...")
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.podcast_library,
-                status=SyncItemStatus.segmenting,
-                item_id=episode.id,
-                item_title=episode.title,
-                current_index=index,
-                total_count=total_segments,
-            )
+
+def get_segments_from_split(
+    episode: EpisodeRequest, segment_paths: List[Path], tmp_path: Path
+) -> List[Path]:
+    """Add intros to segments that were already split (e.g. while streaming the download).
+
+    The source is not available for a one-pass render here, so segments that
+    cannot be spliced are re-encoded one by one.
+    """
+    splice_encoding = _splice_encoding_for_segment(segment_paths[0]) if segment_paths else None
+    return _splice_episode_segments(
+        episode=episode,
+        segment_paths=segment_paths,
+        tmp_path=tmp_path,
+        clip_encoding=splice_encoding or MP3_128K,
+    )
+
+
+def _report_segment_progress(episode: EpisodeRequest, index: int, total: int) -> None:
+    get_progress_reporter().report_progress(
+        SyncProgressMessage(
+            phase=SyncPhase.podcast_library,
+            status=SyncItemStatus.segmenting,
+            item_id=episode.id,
+            item_title=episode.title,
+            current_index=index,
+            total_count=total,
         )
+    )
+
+
+def _render_episode_in_one_pass(episode: EpisodeRequest, episode_path: Path, tmp_path: Path) -> List[Path]:
+    """Render all segments with a single ffmpeg decode/encode pass."""
+    source = probe_source_audio(episode_path)
+    total_segments = segment_count(source.duration_seconds)
+    print(f"Processing {total_segments} segments...")
+    # WAV intros: exact durations for the segment cut points and no extra decode loss
+    intro_paths = _generate_audio_intros(
+        episode=episode, total=total_segments, output_dir=tmp_path, encoding=None
+    )
+    return render_episode_segments(
+        episode=episode,
+        source_path=episode_path,
+        source=source,
+        intro_paths=intro_paths,
+        output_dir=tmp_path,
+        on_segment_done=lambda index, _path: _report_segment_progress(episode, index, total_segments),
+    )
+
 
-        intro_path = _generate_audio_intro(episode=episode, index=index, total=total_segments, output_dir=tmp_path)
-        merged_path = _merge_intro_and_segment(
+def _splice_episode_segments(
+    episode: EpisodeRequest, segment_paths: List[Path], tmp_path: Path, clip_encoding: ClipEncoding
+) -> List[Path]:
+    """Prefix each split segment with its intro and silence.
+
+    Merges run as independent jobs on the shared segment pool; progress is
+    reported as they complete and the result keeps segment order.
+    """
+    total_segments = len(segment_paths)
+    print(f"Processing {total_segments} segments...")
+    intro_paths = _generate_audio_intros(
+        episode=episode, total=total_segments, output_dir=tmp_path, encoding=clip_encoding
+    )
+    silence_path = _generate_silence(episode=episode, output_dir=tmp_path, encoding=clip_encoding)
+    futures = {
+        _segment_executor().submit(
+            _merge_intro_and_segment,
             episode=episode,
             segment_path=segment_path,
             intro_path=intro_path,
+            silence_path=silence_path,
             output_dir=tmp_path,
             index=index,
-        )
-        final_segments.append(merged_path)
+        ): index
+        for index, (segment_path, intro_path) in enumerate(zip(segment_paths, intro_paths), start=1)
+    }
+    final_segments: Dict[int, Path] = {}
+    try:
+        for completed, future in enumerate(as_completed(futures), start=1):
+            final_segments[futures[future]] = future.result()
+            print(f"Processed segment {futures[future]} ({completed} of {total_segments})")
+            _report_segment_progress(episode, completed, total_segments)
+    finally:
+        # Do not leave jobs writing into a temp dir the caller is about to delete.
+        for future in futures:
+            future.cancel()
+        wait(futures)
+    return [final_segments[index] for index in sorted(final_segments)]
 
-    return final_segments
 
+def _segment_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for segment merge jobs, shared by concurrently segmented episodes."""
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is None:
+            _segment_pool = ThreadPoolExecutor(
+                max_workers=max(1, config.podcast_segment_workers),
+                thread_name_prefix="podcast-segment",
+            )
+        return _segment_pool
 
-def _split_podcast_episode(episode_path: Path, output_dir: Path) -> List[Path]:
-    """Split the podcast episode into 10-minute segments using ffmpeg.
-    Returns list of segment file paths."""
-    segment_duration = 60 * 10  # 10 minutes in seconds
-    segment_pattern = output_dir / "segment_%03d.mp3"
 
-    # Use ffmpeg to split the file
-    cmd = [
+def split_command(input_args: List[str], output_dir: Path) -> List[str]:
+    """ffmpeg command that stream-copies an MP3 input into 10-minute segment files."""
+    segment_pattern = output_dir / "segment_%03d.mp3"
+    return [
         config.ffmpeg_path,
-        '-i', str(episode_path),
+        *input_args,
         '-f', 'segment',
-        '-segment_time', str(segment_duration),
+        '-segment_time', str(SEGMENT_SECONDS),
         '-c', 'copy',
         str(segment_pattern)
     ]
 
-    subprocess.run(cmd, check=True, capture_output=True)
 
-    # Find all generated segments
-    segments = sorted(output_dir.glob("segment_*.mp3"))
-    return segments
+def split_segment_paths(output_dir: Path) -> List[Path]:
+    """Segment files written by `split_command`, in order."""
+    return sorted(output_dir.glob("segment_*.mp3"))
 
 
-def _generate_audio_intro(episode: EpisodeRequest, index: int, total: int, output_dir: Path) -> Path:
-    """Generate an intro audio segment for the given index out of total segments. e.g. "1 of 5"
-    Returns path to the generated audio file.
-    Uses piper to generate the audio in the format: "{index}_of_{total}.mp3"
-    """
-    #convert episode.date to "November 5th"
-    date_str = episode.date.strftime("%B %d")
-    text  = f"{date_str}. {index} of {total}"
-    wav_output = output_dir / f"intro_{index}_of_{total}.wav"
-    mp3_output = output_dir / f"intro_{index}_of_{total}.mp3"
-
-    # Use piper to generate the speech (outputs WAV)
-    piper_cmd_parts = config.piper_cmd.split()
-    cmd = [
-        *piper_cmd_parts,
-        '-m', config.piper_voice_model_path,
-        '-f', str(wav_output),
-        '--', text
-    ]
+def _split_podcast_episode(episode_path: Path, output_dir: Path) -> List[Path]:
+    """Split the podcast episode into 10-minute segments using ffmpeg.
+    Returns list of segment file paths."""
+    subprocess.run(split_command(['-i', str(episode_path)], output_dir), check=True, capture_output=True)
+    return split_segment_paths(output_dir)
 
-    # Pipe the text to piper via stdin
-    subprocess.run(cmd, check=True, capture_output=True)
 
-    # Convert WAV to MP3 using ffmpeg
-    cmd = [
-        config.ffmpeg_path,
-        '-i', str(wav_output),
-        '-codec:a', 'libmp3lame',
-        '-b:a', '128k',
-        str(mp3_output)
-    ]
-    subprocess.run(cmd, check=True, capture_output=True)
+def _splice_encoding_for_segment(segment_path: Path) -> Optional[ClipEncoding]:
+    """Return an MP3 encoding matching a constant-bitrate segment, or None if it cannot be spliced."""
+    try:
+        info = probe_mp3(segment_path)
+    except Mp3SpliceError as exc:
+        print(f"Could not probe segment parameters: {exc}")
+        return None
+    if not info.constant_bitrate:
+        return None
+    return ClipEncoding(
+        bitrate=f"{info.bitrate_kbps}k",
+        sample_rate=info.sample_rate,
+        channels=info.channels,
+    )
 
-    return mp3_output
 
+def _generate_audio_intros(
+    episode: EpisodeRequest, total: int, output_dir: Path, encoding: Optional[ClipEncoding] = MP3_128K
+) -> List[Path]:
+    """Generate the intro clips for every segment of an episode, e.g. "November 05. 1 of 5".
+    Returns paths to the generated audio files, named "intro_{index}_of_{total}.mp3"
+    (".wav" with no encoding).
+    All intros are synthesized as one batch with the persistent Piper engine; clips
+    already synthesized for the same text are served from the TTS cache.
+    """
+    #convert episode.date to "November 5th"
+    date_str = episode.date.strftime("%B %d")
+    extension = encoding.extension if encoding else "wav"
+    requests = [
+        (f"{date_str}. {index} of {total}", output_dir / f"intro_{index}_of_{total}.{extension}")
+        for index in range(1, total + 1)
+    ]
+    return synthesize_speech_batch(requests, encoding=encoding)
 
-def _merge_intro_and_segment(episode: EpisodeRequest, segment_path: Path, intro_path: Path, output_dir: Path, index: int) -> Path:
-    """Merge intro audio and segment into a single audio file with 1 second silence between them.
-    Returns path to the merged file."""
-    sanitized_title = re.sub(r'[^\w\s-]', '', episode.title)
-    sanitized_title = re.sub(r'[\s]+', '_', sanitized_title.strip())
-    output_path = output_dir / f"{sanitized_title}_{episode.id}_{index:03d}.mp3"
 
-    # Generate 0.5 second of silence
-    silence_path = output_dir / f"silence_{episode.id}_{index}.mp3"
+def _generate_silence(episode: EpisodeRequest, output_dir: Path, encoding: ClipEncoding) -> Path:
+    """Generate 0.5 second of silence encoded like the intros."""
+    silence_path = output_dir / f"silence_{episode.id}.mp3"
+    sample_rate = encoding.sample_rate or 44100
+    channel_layout = "mono" if encoding.channels == 1 else "stereo"
     silence_cmd = [
         config.ffmpeg_path,
         '-f', 'lavfi',
-        '-i', 'anullsrc=r=44100:cl=stereo',
+        '-i', f'anullsrc=r={sample_rate}:cl={channel_layout}',
         '-t', '0.5',
-        '-codec:a', 'libmp3lame',
-        '-b:a', '128k',
+        *encoding.ffmpeg_args(),
         str(silence_path)
     ]
     subprocess.run(silence_cmd, check=True, capture_output=True)
+    return silence_path
+
+
+def _merge_intro_and_segment(
+    episode: EpisodeRequest,
+    segment_path: Path,
+    intro_path: Path,
+    silence_path: Path,
+    output_dir: Path,
+    index: int,
+) -> Path:
+    """Merge intro audio and segment into a single audio file with 0.5 second silence between them.
+    Frames are spliced without re-encoding when the streams match; otherwise ffmpeg re-encodes.
+    Returns path to the merged file."""
+    output_path = output_dir / segment_file_name(episode, index)
+
+    try:
+        return splice_mp3([intro_path, silence_path, segment_path], output_path)
+    except Mp3SpliceError as exc:
+        print(f"Segment {index} cannot be spliced, re-encoding with ffmpeg: {exc}")
 
     # Create a temporary file list for ffmpeg concat
     concat_list_path = output_dir / f"concat_list_{index}.txt"
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -25,6 +25,13 @@ class EpisodeRequest(BaseModel):
     title: str
 
 
+class SegmentFile(BaseModel):
+    """A finished segment in the episode directory and the blob holding its audio."""
+
+    name: str
+    blob_hash: str
+
+
 class EpisodeRecord(BaseModel):
     """Processed podcast episode stored in the library."""
 
@@ -34,6 +41,7 @@ class EpisodeRecord(BaseModel):
     status: EpisodeStatus = EpisodeStatus.PENDING
     episode_dir: Optional[str] = None
     segment_count: Optional[int] = None
+    segments: List[SegmentFile] = Field(default_factory=list)
     error_message: Optional[str] = None
 
 
@@ -0,0 +1,172 @@
+"""Single-pass rendering of podcast segments with their spoken intros.
+
+The source is decoded once. `asegment` cuts it into SEGMENT_SECONDS pieces, each
+piece is preceded by its intro clip and 0.5s of generated silence in one
+`concat`, and the joined stream is encoded once and written back out as
+separate files by ffmpeg's segment muxer, cutting at the start of each intro.
+"""
+
+import math
+import re
+import subprocess
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from open_swim.config import config
+from open_swim.media.podcast.models import EpisodeRequest
+
+SEGMENT_SECONDS = 60 * 10
+INTRO_SILENCE_SECONDS = 0.5
+OUTPUT_BITRATE = "128k"
+_DURATION = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+_AUDIO_STREAM = re.compile(r"Audio: [^,]+, (\d+) Hz, (mono|stereo)")
+
+
+@dataclass(frozen=True)
+class SourceAudio:
+    """Duration and output-relevant stream parameters of an episode source."""
+
+    duration_seconds: float
+    sample_rate: int = 44100
+    channel_layout: str = "stereo"
+
+    @property
+    def output_format(self) -> str:
+        return (
+            f"aresample={self.sample_rate},"
+            f"aformat=sample_fmts=fltp:channel_layouts={self.channel_layout}"
+        )
+
+
+def segment_file_stem(episode: EpisodeRequest) -> str:
+    """Sanitized `{title}_{id}` prefix shared by all segment files of an episode."""
+    sanitized_title = re.sub(r'[^\w\s-]', '', episode.title)
+    sanitized_title = re.sub(r'[\s]+', '_', sanitized_title.strip())
+    return f"{sanitized_title}_{episode.id}"
+
+
+def segment_file_name(episode: EpisodeRequest, index: int) -> str:
+    """File name of the 1-based `index`-th final segment of an episode."""
+    return f"{segment_file_stem(episode)}_{index:03d}.mp3"
+
+
+def probe_source_audio(source_path: Path) -> SourceAudio:
+    """Return the duration, sample rate and channel layout ffmpeg reports for a media file.
+
+    The output keeps the source's rate and layout, so a mono podcast is not
+    upmixed (and encoded at twice the cost) just to add intros.
+    """
+    result = subprocess.run(
+        [config.ffmpeg_path, "-hide_banner", "-i", str(source_path)],
+        capture_output=True,
+        text=True,
+    )
+    match = _DURATION.search(result.stderr)
+    if not match:
+        raise RuntimeError(f"Could not determine duration of {source_path}")
+    hours, minutes, seconds = match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    stream = _AUDIO_STREAM.search(result.stderr)
+    if not stream:
+        return SourceAudio(duration_seconds=duration)
+    return SourceAudio(
+        duration_seconds=duration, sample_rate=int(stream.group(1)), channel_layout=stream.group(2)
+    )
+
+
+def segment_count(duration_seconds: float) -> int:
+    """Number of SEGMENT_SECONDS pieces; a tail under a second joins the last piece."""
+    return max(1, math.ceil((duration_seconds - 1.0) / SEGMENT_SECONDS))
+
+
+def _wav_duration_seconds(path: Path) -> float:
+    with wave.open(str(path), "rb") as clip:
+        return clip.getnframes() / clip.getframerate()
+
+
+def _build_filter_graph(count: int, source: SourceAudio) -> str:
+    """Source -> asegment pieces; (intro, silence, piece) for each piece -> one concat."""
+    piece_labels = "".join(f"[piece{k}]" for k in range(count))
+    if count > 1:
+        timestamps = "|".join(str(SEGMENT_SECONDS * k) for k in range(1, count))
+        filters = [f"[0:a]asegment=timestamps={timestamps}{piece_labels}"]
+    else:
+        filters = [f"[0:a]anull{piece_labels}"]
+    concat_inputs = []
+    for k in range(count):
+        filters += [
+            f"[piece{k}]asetpts=PTS-STARTPTS,{source.output_format}[track{k}]",
+            f"[{k + 1}:a]{source.output_format}[intro{k}]",
+            f"anullsrc=r={source.sample_rate}:cl={source.channel_layout},"
+            f"atrim=duration={INTRO_SILENCE_SECONDS},{source.output_format}[silence{k}]",
+        ]
+        concat_inputs.append(f"[intro{k}][silence{k}][track{k}]")
+    filters.append(f"{''.join(concat_inputs)}concat=n={3 * count}:v=0:a=1[out]")
+    return ";".join(filters)
+
+
+def _segment_times(intro_paths: Sequence[Path]) -> List[float]:
+    """Output timestamps at which each intro after the first starts."""
+    times: List[float] = []
+    position = 0.0
+    for intro_path in intro_paths[:-1]:
+        position += _wav_duration_seconds(intro_path) + INTRO_SILENCE_SECONDS + SEGMENT_SECONDS
+        times.append(position)
+    return times
+
+
+def render_episode_segments(
+    episode: EpisodeRequest,
+    source_path: Path,
+    source: SourceAudio,
+    intro_paths: Sequence[Path],
+    output_dir: Path,
+    on_segment_done: Optional[Callable[[int, Path], None]] = None,
+) -> List[Path]:
+    """Render `len(intro_paths)` final segment files in one ffmpeg run.
+
+    `intro_paths` are WAV clips, one per SEGMENT_SECONDS piece of the source.
+    Files are named `{title}_{id}_{index:03d}.mp3`; `on_segment_done(index, path)`
+    is called as the segment muxer finishes each one.
+    """
+    count = len(intro_paths)
+    stem = segment_file_stem(episode)
+    cmd = [config.ffmpeg_path, "-hide_banner", "-nostats", "-loglevel", "error", "-i", str(source_path)]
+    for intro_path in intro_paths:
+        cmd += ["-i", str(intro_path)]
+    cmd += [
+        "-filter_complex", _build_filter_graph(count, source),
+        "-map", "[out]",
+        "-codec:a", "libmp3lame",
+        "-b:a", OUTPUT_BITRATE,
+        "-f", "segment",
+        "-segment_format", "mp3",
+        "-segment_start_number", "1",
+        "-reset_timestamps", "1",
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "flat",
+    ]
+    times = _segment_times(intro_paths)
+    if times:
+        cmd += ["-segment_times", ",".join(f"{t:.6f}" for t in times)]
+    cmd += ["-y", str(output_dir / f"{stem}_%03d.mp3")]
+
+    print(f"Rendering {count} segments with intros in one pass for file: {source_path}")
+    log_path = output_dir / f"render_{episode.id}.log"
+    completed: List[Path] = []
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, text=True)
+        assert process.stdout is not None
+        for line in process.stdout:
+            name = line.strip()
+            if not name:
+                continue
+            completed.append(output_dir / name)
+            if on_segment_done is not None:
+                on_segment_done(len(completed), output_dir / name)
+        returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {log_path.read_text(encoding='utf-8')}")
+    return completed
@@ -1,9 +1,18 @@
 import json
 import os
-from typing import List
+import threading
+from typing import Callable, List, Optional, Set
 
 from open_swim.config import config
-from open_swim.media.podcast.models import EpisodeRequest, PodcastLibrary
+from open_swim.media.record_store import RecordStore, open_record_store
+from open_swim.media.podcast.models import (
+    EpisodeRecord,
+    EpisodeRequest,
+    PodcastLibrary,
+)
+
+_library_records: Optional[RecordStore[EpisodeRecord]] = None
+_library_records_lock = threading.Lock()
 
 
 def load_episode_requests() -> List[EpisodeRequest]:
@@ -24,19 +33,45 @@ def save_episode_requests(requests: List[EpisodeRequest]) -> None:
         json.dump([req.model_dump() for req in requests], f, indent=2, default=str)
 
 
+def _records() -> RecordStore[EpisodeRecord]:
+    global _library_records
+    with _library_records_lock:
+        if _library_records is None:
+            _library_records = open_record_store(config.podcasts_library_path, "episodes", EpisodeRecord)
+        return _library_records
+
+
 def load_library() -> PodcastLibrary:
     """Load podcast library metadata."""
-    info_json_path = os.path.join(config.podcasts_library_path, "info.json")
-    if not os.path.exists(info_json_path):
-        return PodcastLibrary()
-    with open(info_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return PodcastLibrary(**data)
+    return PodcastLibrary(episodes=_records().load_all())
 
 
 def save_library(library: PodcastLibrary) -> None:
-    """Persist podcast library metadata."""
-    os.makedirs(config.podcasts_library_path, exist_ok=True)
-    info_json_path = os.path.join(config.podcasts_library_path, "info.json")
-    with open(info_json_path, "w", encoding="utf-8") as f:
-        json.dump(library.model_dump(), f, indent=2, default=str)
+    """Persist podcast library metadata, replacing all stored records."""
+    _records().replace_all(library.episodes)
+
+
+def get_episode(episode_id: str) -> Optional[EpisodeRecord]:
+    """Load a single episode record."""
+    return _records().get(episode_id)
+
+
+def update_episode(
+    episode_id: str, mutate: Callable[[Optional[EpisodeRecord]], EpisodeRecord]
+) -> EpisodeRecord:
+    """Atomically replace an episode record with `mutate(current)`."""
+    return _records().update(episode_id, mutate)
+
+
+def referenced_blob_hashes() -> Set[str]:
+    """Blob hashes of all episode segments in the library."""
+    return {
+        segment.blob_hash
+        for record in _records().load_all().values()
+        for segment in record.segments
+    }
+
+
+def flush_library() -> None:
+    """Write any pending library changes to disk."""
+    _records().flush()
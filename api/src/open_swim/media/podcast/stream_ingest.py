@@ -0,0 +1,140 @@
+"""Streaming ingest: split a podcast episode into segments while it downloads.
+
+The response body is written straight into ffmpeg's segment muxer through a
+pipe (`-f mp3 -i pipe:0 -f segment -c copy`), so segment files appear while
+bytes are still arriving and the episode is never stored whole on disk.
+
+The first PROBE_BYTES are read before ffmpeg is started and decide whether the
+episode is streamed at all. `StreamFallback` is raised, and the episode goes
+through the resumable download-then-split path instead, when:
+- the body is not a plain MP3 (content encoding, or no MPEG frames at the start),
+- PODCAST_RENDER_MODE is `auto` and the audio is not constant bitrate, since
+  the one-pass render needs the whole file,
+- the server delivered the probe slower than PODCAST_STREAM_MIN_BYTES_PER_SECOND,
+  where a dropped connection is likely and only a file download can resume, or
+- the connection breaks or ends short while streaming.
+On a slow server the probe bytes are kept as a partial download, so the
+fallback continues with a Range request rather than starting over.
+"""
+
+import subprocess
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import requests
+
+from open_swim.config import config
+from open_swim.media.mp3_splice import Mp3SpliceError, probe_mp3_prefix
+from open_swim.media.podcast.download import get_http_session, save_partial_download
+from open_swim.media.podcast.episode_processor import split_command, split_segment_paths
+from open_swim.media.podcast.models import EpisodeRequest
+
+PROBE_BYTES = 1024 * 1024
+
+
+class StreamFallback(Exception):
+    """Raised when an episode should be downloaded to a file and split from there."""
+
+    pass
+
+
+def stream_split_episode(episode: EpisodeRequest, output_dir: Path) -> List[Path]:
+    """Download an episode through ffmpeg's segment muxer.
+
+    Returns the `segment_%03d.mp3` files written to `output_dir`. Raises
+    StreamFallback (with no segment files left behind) if the episode should be
+    downloaded instead, and requests exceptions for HTTP errors.
+    """
+    url = episode.download_url
+    response = get_http_session().get(url, stream=True, timeout=30)
+    with response:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=config.podcast_download_chunk_bytes)
+        started = time.monotonic()
+        prefix = _read_prefix(chunks, PROBE_BYTES)
+        elapsed = time.monotonic() - started
+
+        reason = _fallback_reason(response, prefix, elapsed)
+        if reason is not None:
+            save_partial_download(episode, response, prefix)
+            raise StreamFallback(reason)
+
+        print(f"[Podcast Stream] Splitting {url} while downloading")
+        try:
+            received = _pipe_to_segmenter(prefix, chunks, output_dir)
+        except StreamFallback:
+            _remove_segments(output_dir)
+            raise
+        expected = _expected_length(response)
+        if expected is not None and received != expected:
+            _remove_segments(output_dir)
+            raise StreamFallback(f"stream ended after {received} of {expected} bytes")
+    return split_segment_paths(output_dir)
+
+
+def _read_prefix(chunks: Iterator[bytes], size: int) -> bytes:
+    prefix = bytearray()
+    for chunk in chunks:
+        prefix += chunk
+        if len(prefix) >= size:
+            break
+    return bytes(prefix)
+
+
+def _expected_length(response: requests.Response) -> Optional[int]:
+    value = response.headers.get("Content-Length")
+    return int(value) if value and value.isdigit() else None
+
+
+def _fallback_reason(response: requests.Response, prefix: bytes, elapsed: float) -> Optional[str]:
+    """Why the episode should not be streamed, or None if it can be."""
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return f"body is {response.headers['Content-Encoding']}-encoded"
+    try:
+        info = probe_mp3_prefix(prefix, response.url)
+    except Mp3SpliceError as exc:
+        return f"not a plain MP3 stream ({exc})"
+    if config.podcast_render_mode == "auto" and not info.constant_bitrate:
+        return "variable bitrate audio is rendered from the complete file"
+    complete = len(prefix) < PROBE_BYTES
+    if not complete and elapsed > 0 and len(prefix) / elapsed < config.podcast_stream_min_bytes_per_second:
+        return f"server is slow ({len(prefix) / elapsed / 1024:.0f} KiB/s)"
+    return None
+
+
+def _pipe_to_segmenter(prefix: bytes, chunks: Iterator[bytes], output_dir: Path) -> int:
+    """Feed the body into the ffmpeg segmenter; return the number of bytes written."""
+    log_path = output_dir / "stream_split.log"
+    received = 0
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            split_command(["-f", "mp3", "-i", "pipe:0"], output_dir),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+        )
+        assert process.stdin is not None
+        try:
+            process.stdin.write(prefix)
+            received += len(prefix)
+            for chunk in chunks:
+                process.stdin.write(chunk)
+                received += len(chunk)
+            process.stdin.close()
+        except requests.RequestException as exc:
+            process.kill()
+            process.wait()
+            raise StreamFallback(f"connection lost while streaming: {exc}") from exc
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its return code and log say why
+        returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {log_path.read_text(encoding='utf-8', errors='replace')}")
+    log_path.unlink()
+    return received
+
+
+def _remove_segments(output_dir: Path) -> None:
+    for segment_path in split_segment_paths(output_dir):
+        segment_path.unlink()
@@ -1,14 +1,21 @@
-import os
 import re
 import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
-
-import requests
+from typing import List, Optional
 
 from open_swim.config import config
-from open_swim.media.podcast.episode_processor import get_episode_segments
+from open_swim.media import blob_store
+from open_swim.media.podcast.download import (
+    discard_download,
+    download_episode,
+    has_download,
+    prune_downloads,
+)
+from open_swim.media.podcast.episode_processor import get_episode_segments, get_segments_from_split
 from open_swim.media.podcast.episodes_to_sync import load_episodes_to_sync
 from open_swim.messaging.models import SyncItemStatus, SyncPhase, SyncProgressMessage
 from open_swim.messaging.progress import get_progress_reporter
@@ -16,147 +23,238 @@ from open_swim.media.podcast.models import (
     EpisodeRecord,
     EpisodeRequest,
     EpisodeStatus,
-    PodcastLibrary,
+    SegmentFile,
 )
 from open_swim.media.podcast import store
+from open_swim.media.podcast.stream_ingest import StreamFallback, stream_split_episode
+
+
+@dataclass
+class _EpisodeJob:
+    """An episode travelling through the download -> segment pipeline.
+
+    The download stage sets `episode_path` to the downloaded file, or
+    `split_segments` when the episode was split while streaming.
+    """
+
+    episode: EpisodeRequest
+    current_index: int
+    total_count: int
+    episode_path: Optional[Path] = None
+    split_segments: Optional[List[Path]] = None
 
 
 def sync_podcast_episodes() -> None:
-    """Sync multiple podcast episodes by processing each one."""
+    """Sync the requested podcast episodes.
+
+    Downloads share one pooled HTTP session and overlap with segmenting of earlier
+    episodes; see `_run_episode_pipeline`.
+    """
     episodes = load_episodes_to_sync()
+    prune_downloads(episodes)
     total = len(episodes)
+    jobs: List[_EpisodeJob] = []
     for index, episode in enumerate(episodes, start=1):
-        _process_podcast_episode(episode=episode, current_index=index, total_count=total)
+        job = _EpisodeJob(episode=episode, current_index=index, total_count=total)
+        if _is_episode_ready_in_library(episode):
+            print(f"Episode {episode.id} already processed. Skipping.")
+            _report_episode_progress(job, SyncItemStatus.skipped)
+            continue
+        jobs.append(job)
+    try:
+        _run_episode_pipeline(jobs)
+    finally:
+        store.flush_library()
 
 
-def _process_podcast_episode(
-    episode: EpisodeRequest, current_index: int, total_count: int
+def _report_episode_progress(
+    job: _EpisodeJob, status: SyncItemStatus, error_message: str | None = None
 ) -> None:
-    """Process a podcast episode by downloading, splitting, adding intros, and merging segments."""
-    reporter = get_progress_reporter()
-    library_info = store.load_library()
-    existing = library_info.episodes.get(episode.id)
-    if (
+    get_progress_reporter().report_progress(
+        SyncProgressMessage(
+            phase=SyncPhase.podcast_library,
+            status=status,
+            item_id=job.episode.id,
+            item_title=job.episode.title,
+            current_index=job.current_index,
+            total_count=job.total_count,
+            error_message=error_message,
+        )
+    )
+
+
+def _is_episode_ready_in_library(episode: EpisodeRequest) -> bool:
+    existing = store.get_episode(episode.id)
+    return bool(
         existing
         and existing.status == EpisodeStatus.READY
         and existing.episode_dir
-        and os.path.exists(existing.episode_dir)
-    ):
-        print(f"Episode {episode.id} already processed. Skipping.")
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.podcast_library,
-                status=SyncItemStatus.skipped,
-                item_id=episode.id,
-                item_title=episode.title,
-                current_index=current_index,
-                total_count=total_count,
-            )
+        and _ensure_episode_files(existing)
+    )
+
+
+def _ensure_episode_files(record: EpisodeRecord) -> bool:
+    """Check that a READY episode's segments are in place, relinking them from their blobs.
+
+    Episodes from before the blob store are adopted into it on first sight.
+    Returns False when the episode has to be processed again.
+    """
+    assert record.episode_dir is not None
+    episode_dir = Path(record.episode_dir)
+    if not record.segments:
+        segment_paths = sorted(episode_dir.glob("*.mp3")) if episode_dir.exists() else []
+        if not segment_paths:
+            return False
+        segments = [
+            SegmentFile(name=path.name, blob_hash=blob_store.adopt_file(path)) for path in segment_paths
+        ]
+
+        def mutate(existing: EpisodeRecord | None) -> EpisodeRecord:
+            existing = existing or record
+            existing.segments = segments
+            return existing
+
+        store.update_episode(record.id, mutate)
+        return True
+    return all(
+        blob_store.restore_link(
+            segment.blob_hash, episode_dir / segment.name, verify=config.library_verify_blobs
         )
+        for segment in record.segments
+    )
+
+
+def _run_episode_pipeline(jobs: List[_EpisodeJob]) -> None:
+    """Run episodes through the download and segment stages with bounded concurrency.
+
+    Each episode runs on its own pool thread, taking a download slot
+    (PODCAST_DOWNLOAD_WORKERS) and then a segment slot (PODCAST_EPISODE_WORKERS).
+    The pool holds both, so later downloads overlap with earlier episodes being
+    segmented, and independent episodes are segmented on separate cores.
+    """
+    if not jobs:
         return
+    download_workers = max(1, min(config.podcast_download_workers, len(jobs)))
+    episode_workers = max(1, min(config.podcast_episode_workers, len(jobs)))
+    download_slots = threading.BoundedSemaphore(download_workers)
+    segment_slots = threading.BoundedSemaphore(episode_workers)
 
-    try:
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.podcast_library,
-                status=SyncItemStatus.downloading,
-                item_id=episode.id,
-                item_title=episode.title,
-                current_index=current_index,
-                total_count=total_count,
-            )
+    def _run_job(job: _EpisodeJob) -> None:
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_path = Path(tmp_dir)
+                with download_slots:
+                    _download_episode(job, tmp_path)
+                with segment_slots:
+                    _segment_episode(job, tmp_path)
+        except Exception as exc:
+            _fail_episode_job(job, exc)
+
+    with ThreadPoolExecutor(
+        max_workers=download_workers + episode_workers, thread_name_prefix="podcast-episode"
+    ) as executor:
+        for future in [executor.submit(_run_job, job) for job in jobs]:
+            future.result()
+
+
+def _download_episode(job: _EpisodeJob, tmp_path: Path) -> None:
+    """Download stage (I/O-bound): stream-split the episode into `tmp_path`, or download it."""
+    _report_episode_progress(job, SyncItemStatus.downloading)
+    _upsert_episode_record(job.episode, status=EpisodeStatus.DOWNLOADING)
+    if _should_stream(job.episode):
+        try:
+            job.split_segments = stream_split_episode(job.episode, tmp_path)
+            return
+        except StreamFallback as exc:
+            print(f"[Podcast Stream] Downloading {job.episode.id} instead: {exc}")
+    print(f"Downloading podcast from {job.episode.download_url}...")
+    job.episode_path = download_episode(job.episode)
+
+
+def _should_stream(episode: EpisodeRequest) -> bool:
+    # The one-pass render needs the whole file, and a previous partial download is resumed
+    return (
+        config.podcast_ingest_mode == "stream"
+        and config.podcast_render_mode != "graph"
+        and not has_download(episode)
+    )
+
+
+def _segment_episode(job: _EpisodeJob, tmp_path: Path) -> None:
+    """Segment stage (CPU-bound): split, add intros, merge and store the segments."""
+    episode = job.episode
+    _report_episode_progress(job, SyncItemStatus.segmenting)
+    _upsert_episode_record(episode, status=EpisodeStatus.SEGMENTING)
+
+    if job.split_segments is not None:
+        final_segments = get_segments_from_split(
+            episode=episode,
+            segment_paths=job.split_segments,
+            tmp_path=tmp_path,
         )
-        _upsert_episode_record(library_info, episode, status=EpisodeStatus.DOWNLOADING)
-
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir)
-
-            print(f"Downloading podcast from {episode.download_url}...")
-            episode_path = _download_podcast(url=episode.download_url, output_dir=tmp_path)
-
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.podcast_library,
-                    status=SyncItemStatus.segmenting,
-                    item_id=episode.id,
-                    item_title=episode.title,
-                    current_index=current_index,
-                    total_count=total_count,
-                )
-            )
-            _upsert_episode_record(library_info, episode, status=EpisodeStatus.SEGMENTING)
-
-            final_segments = get_episode_segments(
-                episode=episode,
-                episode_path=episode_path,
-                tmp_path=tmp_path,
-            )
-
-            episode_dir = _get_library_episode_directory(episode)
-            _copy_episode_segments_to_library(
-                episode_dir=episode_dir, segments_paths=final_segments
-            )
-
-            _upsert_episode_record(
-                library_info,
-                episode,
-                status=EpisodeStatus.READY,
-                episode_dir=str(episode_dir),
-                segment_count=len(final_segments),
-            )
-            print(f"Processing complete! Generated {len(final_segments)} segments.")
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.podcast_library,
-                    status=SyncItemStatus.completed,
-                    item_id=episode.id,
-                    item_title=episode.title,
-                    current_index=current_index,
-                    total_count=total_count,
-                )
-            )
-    except Exception as exc:
-        print(f"[Error] Failed to sync episode {episode.title} - {episode.id}: {exc}")
-        _upsert_episode_record(library_info, episode, status=EpisodeStatus.ERROR, error_message=str(exc))
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.podcast_library,
-                status=SyncItemStatus.error,
-                item_id=episode.id,
-                item_title=episode.title,
-                current_index=current_index,
-                total_count=total_count,
-                error_message=str(exc),
-            )
+    else:
+        assert job.episode_path is not None
+        final_segments = get_episode_segments(
+            episode=episode,
+            episode_path=job.episode_path,
+            tmp_path=tmp_path,
         )
 
+    episode_dir = _get_library_episode_directory(episode)
+    segments = _store_episode_segments_in_library(
+        episode_dir=episode_dir, segments_paths=final_segments
+    )
+    _remove_previous_episode_directory(store.get_episode(episode.id), episode_dir)
+
+    _upsert_episode_record(
+        episode,
+        status=EpisodeStatus.READY,
+        episode_dir=str(episode_dir),
+        segment_count=len(final_segments),
+        segments=segments,
+    )
+    discard_download(episode)
+    print(f"Processing complete! Generated {len(final_segments)} segments.")
+    _report_episode_progress(job, SyncItemStatus.completed)
+
+
+def _fail_episode_job(job: _EpisodeJob, exc: Exception) -> None:
+    print(f"[Error] Failed to sync episode {job.episode.title} - {job.episode.id}: {exc}")
+    _upsert_episode_record(job.episode, status=EpisodeStatus.ERROR, error_message=str(exc))
+    _report_episode_progress(job, SyncItemStatus.error, error_message=str(exc))
+
 
 def _upsert_episode_record(
-    library_info: PodcastLibrary,
     episode: EpisodeRequest,
     status: EpisodeStatus,
     episode_dir: str | None = None,
     segment_count: int | None = None,
     error_message: str | None = None,
+    segments: List[SegmentFile] | None = None,
 ) -> None:
     """Update or create an episode record with the given status."""
-    record = library_info.episodes.get(episode.id) or EpisodeRecord(
-        id=episode.id,
-        title=episode.title,
-        date=episode.date,
-        status=status,
-        episode_dir=episode_dir,
-        segment_count=segment_count,
-        error_message=error_message,
-    )
-    record.status = status
-    record.error_message = error_message
-    if episode_dir:
-        record.episode_dir = episode_dir
-    if segment_count is not None:
-        record.segment_count = segment_count
-    library_info.episodes[episode.id] = record
-    store.save_library(library_info)
+
+    def mutate(record: EpisodeRecord | None) -> EpisodeRecord:
+        record = record or EpisodeRecord(
+            id=episode.id,
+            title=episode.title,
+            date=episode.date,
+            status=status,
+            episode_dir=episode_dir,
+            segment_count=segment_count,
+            error_message=error_message,
+        )
+        record.status = status
+        record.error_message = error_message
+        if episode_dir:
+            record.episode_dir = episode_dir
+        if segment_count is not None:
+            record.segment_count = segment_count
+        if segments is not None:
+            record.segments = segments
+        return record
+
+    store.update_episode(episode.id, mutate)
 
 
 def _get_library_episode_directory(episode: EpisodeRequest) -> Path:
@@ -167,28 +265,28 @@ def _get_library_episode_directory(episode: EpisodeRequest) -> Path:
     return episode_dir
 
 
-def _copy_episode_segments_to_library(episode_dir: Path, segments_paths: List[Path]) -> None:
+def _store_episode_segments_in_library(episode_dir: Path, segments_paths: List[Path]) -> List[SegmentFile]:
+    """Store segments as blobs linked into `episode_dir`; segment files from an earlier render are removed."""
     episode_dir.mkdir(parents=True, exist_ok=True)
+    segments: List[SegmentFile] = []
     for segment_path in segments_paths:
-        destination = episode_dir / segment_path.name
-        shutil.copy2(segment_path, destination)
+        blob_hash = blob_store.store_blob(segment_path)
+        blob_store.link_blob(blob_hash, episode_dir / segment_path.name)
+        segments.append(SegmentFile(name=segment_path.name, blob_hash=blob_hash))
+    names = {segment.name for segment in segments}
+    for stale_path in episode_dir.glob("*.mp3"):
+        if stale_path.name not in names:
+            stale_path.unlink()
+    return segments
 
 
-def _download_podcast(url: str, output_dir: Path) -> Path:
-    """Download podcast from the given URL.
-    Returns the path to the downloaded file."""
-
-    response = requests.get(url, stream=True, timeout=30)
-    response.raise_for_status()
-
-    filename = (url.split("/")[-1] or "podcast.mp3")[:18]
-    if not filename.endswith(".mp3"):
-        filename += ".mp3"
-
-    output_path = output_dir / filename
-
-    with open(output_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+def _remove_previous_episode_directory(previous: EpisodeRecord | None, episode_dir: Path) -> None:
+    """Drop the old episode directory after a title change; the blob store keeps the content."""
+    if previous is None or not previous.episode_dir or Path(previous.episode_dir) == episode_dir:
+        return
+    previous_dir = Path(previous.episode_dir)
+    if previous_dir.parent != Path(config.podcasts_library_path) or not previous_dir.exists():
+        return
+    print(f"Removing renamed episode directory {previous_dir}")
+    shutil.rmtree(previous_dir)
 
-    return output_path
@@ -0,0 +1,43 @@
+"""Persistence backends for the YouTube and podcast library records.
+
+`open_record_store()` picks the backend from LIBRARY_STORE: `sqlite` (default)
+keeps one row per record in `library.db`, importing an existing `info.json`
+once; `json` keeps the legacy `info.json` snapshot plus an append-only journal of
+record changes, cached in memory.
+"""
+
+from pathlib import Path
+from typing import Type
+
+from open_swim.config import ConfigurationError, config
+from open_swim.media.record_store.base import RecordStore, RecordT
+from open_swim.media.record_store.json_store import JsonRecordStore
+from open_swim.media.record_store.sqlite_store import SqliteRecordStore
+
+
+def open_record_store(
+    directory: str, collection_key: str, model: Type[RecordT]
+) -> RecordStore[RecordT]:
+    """Open the configured record store for a library directory."""
+    json_store: JsonRecordStore[RecordT] = JsonRecordStore(
+        Path(directory) / "info.json",
+        collection_key,
+        model,
+        flush_interval=config.library_flush_interval_seconds,
+        journal_max_bytes=config.library_journal_max_bytes,
+    )
+    if config.library_store == "json":
+        return json_store
+    if config.library_store == "sqlite":
+        return SqliteRecordStore(Path(directory) / "library.db", model, legacy=json_store)
+    raise ConfigurationError(
+        f"Unknown LIBRARY_STORE '{config.library_store}' (expected 'sqlite' or 'json')"
+    )
+
+
+__all__ = [
+    "JsonRecordStore",
+    "RecordStore",
+    "SqliteRecordStore",
+    "open_record_store",
+]
@@ -0,0 +1,39 @@
+from typing import Callable, Dict, Optional, Protocol, TypeVar
+
+from pydantic import BaseModel
+
+RecordT = TypeVar("RecordT", bound=BaseModel)
+
+
+class RecordStore(Protocol[RecordT]):
+    """Keyed persistence for library records (videos, podcast episodes).
+
+    Implementations must be safe to call from several threads at once;
+    `update()` is an atomic read-modify-write of a single record.
+    """
+
+    def load_all(self) -> Dict[str, RecordT]:
+        """Return every stored record keyed by id."""
+        ...
+
+    def replace_all(self, records: Dict[str, RecordT]) -> None:
+        """Replace the stored records with `records`."""
+        ...
+
+    def get(self, record_id: str) -> Optional[RecordT]:
+        """Return one record, or None if it is not stored."""
+        ...
+
+    def put(self, record_id: str, record: RecordT) -> None:
+        """Insert or overwrite one record."""
+        ...
+
+    def update(
+        self, record_id: str, mutate: Callable[[Optional[RecordT]], RecordT]
+    ) -> RecordT:
+        """Atomically replace a record with `mutate(current)` and return the result."""
+        ...
+
+    def flush(self) -> None:
+        """Make all accepted writes durable on disk."""
+        ...
@@ -0,0 +1,231 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Optional, TextIO, Tuple, Type
+
+from open_swim.media.record_store.base import RecordT
+
+_FileSignature = Optional[Tuple[int, int]]
+_MISSING = object()
+
+
+class JsonRecordStore(Generic[RecordT]):
+    """Records kept in an `info.json` snapshot plus an append-only journal, cached in memory.
+
+    The snapshot has the legacy layout `{"schema_version": 1, "<collection>": {id: record}}`.
+    Every `put()`/`update()` appends one line with the record's changed fields
+    to `info.journal.jsonl`, so a status transition costs a small append rather
+    than a full rewrite. Loading replays the journal over the snapshot; reads are
+    served from memory and only reload when either file changes underneath the
+    cache. Once the journal passes `journal_max_bytes` it is compacted: the cache
+    is written as a new snapshot (temp file, fsync, rename) and the journal is
+    rotated to `info.journal.jsonl.1`, keeping the previous run of transitions.
+    Appends are fsynced `flush_interval` seconds later (0 syncs every write), on
+    `flush()`, and at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        collection_key: str,
+        model: Type[RecordT],
+        flush_interval: float = 0.0,
+        journal_max_bytes: int = 1024 * 1024,
+    ) -> None:
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(f"{self.path.stem}.journal.jsonl")
+        self._collection_key = collection_key
+        self._model = model
+        self._flush_interval = flush_interval
+        self._journal_max_bytes = journal_max_bytes
+        self._lock = threading.RLock()
+        self._records: Optional[Dict[str, RecordT]] = None
+        self._signature: Tuple[_FileSignature, _FileSignature] = (None, None)
+        self._journal: Optional[TextIO] = None
+        self._unsynced = False
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def exists(self) -> bool:
+        return self.path.exists() or self.journal_path.exists()
+
+    @staticmethod
+    def _file_signature(path: Path) -> _FileSignature:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current_signature(self) -> Tuple[_FileSignature, _FileSignature]:
+        return self._file_signature(self.path), self._file_signature(self.journal_path)
+
+    def _read(self) -> Dict[str, RecordT]:
+        documents: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                documents = json.load(f).get(self._collection_key, {})
+        self._replay(documents)
+        return {
+            record_id: self._model.model_validate(document)
+            for record_id, document in documents.items()
+        }
+
+    def _replay(self, documents: Dict[str, Dict[str, Any]]) -> None:
+        """Apply journal entries, in order, on top of the snapshot documents."""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can tear an append; the entries around it are intact.
+                    print(f"[Library Store] Ignoring torn journal entry {self.journal_path}:{line_number}")
+                    continue
+                documents.setdefault(entry["id"], {}).update(entry["fields"])
+
+    def _cached(self) -> Dict[str, RecordT]:
+        """Return the cache, reloading it if the snapshot or journal changed on disk."""
+        signature = self._current_signature()
+        if self._records is None or signature != self._signature:
+            self._close_journal()
+            self._records = self._read()
+            self._signature = signature
+        return self._records
+
+    def _open_journal(self) -> TextIO:
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if self._journal.tell() > 0 and not self._ends_with_newline():
+                self._journal.write("\n")  # terminate a torn entry so the next one parses
+        return self._journal
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.journal_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._sync_journal()
+            self._journal.close()
+            self._journal = None
+
+    def _sync_journal(self) -> None:
+        if self._journal is not None and self._unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        self._unsynced = False
+
+    def _append(self, record_id: str, previous: Optional[RecordT], record: RecordT) -> None:
+        before = previous.model_dump(mode="json") if previous else {}
+        after = record.model_dump(mode="json")
+        fields = {key: value for key, value in after.items() if before.get(key, _MISSING) != value}
+        if not fields:
+            return
+        journal = self._open_journal()
+        journal.write(json.dumps({"ts": time.time(), "id": record_id, "fields": fields}) + "\n")
+        journal.flush()
+        self._unsynced = True
+        if journal.tell() >= self._journal_max_bytes:
+            self._compact()
+        self._signature = self._current_signature()
+        self._schedule_sync()
+
+    def _schedule_sync(self) -> None:
+        if self._flush_interval <= 0:
+            self._sync_journal()
+        elif self._unsynced and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self._flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _write_snapshot(self) -> None:
+        assert self._records is not None
+        document = {
+            "schema_version": 1,
+            self._collection_key: {
+                record_id: record.model_dump(mode="json")
+                for record_id, record in self._records.items()
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _compact(self) -> None:
+        """Fold the journal into a new snapshot and start a fresh journal.
+
+        Replaying a journal over a snapshot that already contains it is
+        idempotent, so a crash between the two steps loses nothing.
+        """
+        self._write_snapshot()
+        self._close_journal()
+        if self.journal_path.exists():
+            os.replace(self.journal_path, self.journal_path.with_name(self.journal_path.name + ".1"))
+        self._signature = self._current_signature()
+        print(f"[Library Store] Compacted {len(self._records or {})} records into {self.path}")
+
+    def flush(self) -> None:
+        """Fsync pending journal appends."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._sync_journal()
+
+    def archive(self, suffix: str) -> None:
+        """Rename the snapshot and journal out of the way, e.g. after importing them elsewhere."""
+        with self._lock:
+            self._close_journal()
+            for path in (self.path, self.journal_path):
+                if path.exists():
+                    os.replace(path, path.with_name(path.name + suffix))
+            self._records = None
+
+    def load_all(self) -> Dict[str, RecordT]:
+        with self._lock:
+            return {
+                record_id: record.model_copy(deep=True)
+                for record_id, record in self._cached().items()
+            }
+
+    def replace_all(self, records: Dict[str, RecordT]) -> None:
+        with self._lock:
+            self._cached()
+            self._records = {
+                record_id: record.model_copy(deep=True) for record_id, record in records.items()
+            }
+            self._compact()
+
+    def get(self, record_id: str) -> Optional[RecordT]:
+        with self._lock:
+            record = self._cached().get(record_id)
+            return record.model_copy(deep=True) if record else None
+
+    def put(self, record_id: str, record: RecordT) -> None:
+        with self._lock:
+            records = self._cached()
+            previous = records.get(record_id)
+            records[record_id] = record.model_copy(deep=True)
+            self._append(record_id, previous, record)
+
+    def update(
+        self, record_id: str, mutate: Callable[[Optional[RecordT]], RecordT]
+    ) -> RecordT:
+        with self._lock:
+            records = self._cached()
+            previous = records.get(record_id)
+            record = mutate(previous.model_copy(deep=True) if previous else None)
+            records[record_id] = record.model_copy(deep=True)
+            self._append(record_id, previous, record)
+            return record
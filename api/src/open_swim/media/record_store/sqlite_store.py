@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterator, Optional, Type
+
+from open_swim.media.record_store.base import RecordT
+from open_swim.media.record_store.json_store import JsonRecordStore
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+_MIGRATED_KEY = "migrated_from_json"
+_BUSY_TIMEOUT_SECONDS = 30.0
+
+
+class SqliteRecordStore(Generic[RecordT]):
+    """Records kept one row per id in a SQLite database in WAL mode.
+
+    Each thread gets its own connection; writes run in `BEGIN IMMEDIATE`
+    transactions so concurrent read-modify-write cycles serialize on the
+    database lock instead of overwriting each other. On first open, records
+    from `legacy` (the old info.json and its journal) are imported once and
+    the files are renamed with a `.migrated` suffix.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        model: Type[RecordT],
+        legacy: Optional[JsonRecordStore[RecordT]] = None,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self._model = model
+        self._legacy = legacy
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                str(self.db_path), timeout=_BUSY_TIMEOUT_SECONDS, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        if not self._initialized:
+            self._initialize(connection)
+        return connection
+
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            self._migrate_legacy(connection)
+            self._initialized = True
+
+    def _migrate_legacy(self, connection: sqlite3.Connection) -> None:
+        legacy = self._legacy if self._legacy is not None and self._legacy.exists() else None
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            migrated = connection.execute(
+                "SELECT value FROM meta WHERE key = ?", (_MIGRATED_KEY,)
+            ).fetchone()
+            if migrated is not None:
+                legacy = None
+            else:
+                if legacy is not None:
+                    records = legacy.load_all()
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO records (id, data) VALUES (?, ?)",
+                        [(record_id, record.model_dump_json()) for record_id, record in records.items()],
+                    )
+                    print(f"[Library Store] Imported {len(records)} records from {legacy.path}")
+                connection.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    (_MIGRATED_KEY, str(legacy.path) if legacy is not None else ""),
+                )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        if legacy is not None:
+            legacy.archive(".migrated")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _decode(self, data: str) -> RecordT:
+        return self._model.model_validate_json(data)
+
+    def load_all(self) -> Dict[str, RecordT]:
+        rows = self._connection().execute("SELECT id, data FROM records").fetchall()
+        return {record_id: self._decode(data) for record_id, data in rows}
+
+    def replace_all(self, records: Dict[str, RecordT]) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM records")
+            connection.executemany(
+                "INSERT INTO records (id, data) VALUES (?, ?)",
+                [(record_id, record.model_dump_json()) for record_id, record in records.items()],
+            )
+
+    def get(self, record_id: str) -> Optional[RecordT]:
+        row = self._connection().execute(
+            "SELECT data FROM records WHERE id = ?", (record_id,)
+        ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def put(self, record_id: str, record: RecordT) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO records (id, data) VALUES (?, ?)",
+                (record_id, record.model_dump_json()),
+            )
+
+    def update(
+        self, record_id: str, mutate: Callable[[Optional[RecordT]], RecordT]
+    ) -> RecordT:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT data FROM records WHERE id = ?", (record_id,)
+            ).fetchone()
+            record = mutate(self._decode(row[0]) if row else None)
+            connection.execute(
+                "INSERT OR REPLACE INTO records (id, data) VALUES (?, ?)",
+                (record_id, record.model_dump_json()),
+            )
+            return record
+
+    def flush(self) -> None:
+        # Every write commits its own transaction.
+        pass
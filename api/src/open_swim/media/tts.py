@@ -0,0 +1,213 @@
+"""Piper text-to-speech with a persistent, content-addressed clip cache.
+
+Clips are keyed by the normalized text, the voice model (path and content hash)
+and the output encoding, so a cache hit returns a ready-encoded clip without
+spawning Piper or ffmpeg. Misses are synthesized by the persistent Piper
+engine. The cache is bounded by TTS_CACHE_MAX_BYTES and evicts least recently
+used clips first.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from open_swim.config import config
+from open_swim.media.hashing import sha256_file
+from open_swim.media.piper_engine import get_piper_engine
+
+
+@dataclass(frozen=True)
+class ClipEncoding:
+    """ffmpeg output encoding applied to Piper's WAV before caching."""
+
+    codec: str = "libmp3lame"
+    bitrate: str = "128k"
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    extension: str = "mp3"
+
+    def ffmpeg_args(self) -> List[str]:
+        args = ["-codec:a", self.codec, "-b:a", self.bitrate]
+        if self.sample_rate is not None:
+            args += ["-ar", str(self.sample_rate)]
+        if self.channels is not None:
+            args += ["-ac", str(self.channels)]
+        return args
+
+    def cache_key(self) -> str:
+        return f"{self.codec}:{self.bitrate}:{self.sample_rate}:{self.channels}:{self.extension}"
+
+
+MP3_128K = ClipEncoding()
+
+_cache_lock = threading.Lock()
+_voice_hashes: Dict[Tuple[str, int, float], str] = {}
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _voice_model_hash() -> str:
+    """Content hash of the voice model, memoized per (path, size, mtime)."""
+    model_path = config.piper_voice_model_path
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return "missing"
+    memo_key = (model_path, stat.st_size, stat.st_mtime)
+    if memo_key not in _voice_hashes:
+        _voice_hashes[memo_key] = sha256_file(model_path)
+    return _voice_hashes[memo_key]
+
+
+def _clip_cache_key(text: str, encoding: Optional[ClipEncoding]) -> str:
+    encoding_key = encoding.cache_key() if encoding else "piper-wav"
+    material = "\n".join(
+        [normalize_text(text), config.piper_voice_model_path, _voice_model_hash(), encoding_key]
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _cached_clip_path(text: str, encoding: Optional[ClipEncoding]) -> Path:
+    cache_dir = Path(config.tts_cache_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    extension = encoding.extension if encoding else "wav"
+    return cache_dir / f"{_clip_cache_key(text, encoding)}.{extension}"
+
+
+def _touch(cached_path: Path) -> bool:
+    """Mark a cached clip as recently used; False if it is not in the cache."""
+    try:
+        os.utime(cached_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _fill_cache(texts: Sequence[str], encoding: Optional[ClipEncoding]) -> List[Path]:
+    """Return cached clip paths for `texts`, synthesizing the misses in one batch."""
+    cached_paths = [_cached_clip_path(normalize_text(text), encoding) for text in texts]
+    with _cache_lock:
+        pending: Dict[Path, str] = {
+            cached_path: normalize_text(text)
+            for text, cached_path in zip(texts, cached_paths)
+            if not _touch(cached_path)
+        }
+
+    if pending:
+        _synthesize_into_cache(
+            [(text, cached_path) for cached_path, text in pending.items()], encoding
+        )
+        with _cache_lock:
+            _evict_if_needed(keep=set(cached_paths))
+    return cached_paths
+
+
+def _encode_clips(wav_paths: Sequence[Path], encoding: ClipEncoding, output_paths: Sequence[Path]) -> None:
+    """Encode several WAVs with one ffmpeg process (one input/output pair each)."""
+    cmd = [config.ffmpeg_path, "-y"]
+    for wav_path in wav_paths:
+        cmd += ["-i", str(wav_path)]
+    for index, output_path in enumerate(output_paths):
+        cmd += ["-map", f"{index}:a", *encoding.ffmpeg_args(), "-f", encoding.extension, str(output_path)]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def _synthesize_into_cache(
+    pending: Sequence[Tuple[str, Path]], encoding: Optional[ClipEncoding]
+) -> None:
+    """Synthesize (text, cached_path) pairs with the Piper engine and atomically move them into the cache."""
+    cache_dir = Path(config.tts_cache_path)
+    with tempfile.TemporaryDirectory(dir=cache_dir, prefix=".batch-") as work_dir:
+        work_path = Path(work_dir)
+        wav_paths = [work_path / f"{index}.wav" for index in range(len(pending))]
+        get_piper_engine().synthesize_batch(
+            [(text, wav_path) for (text, _), wav_path in zip(pending, wav_paths)]
+        )
+        if encoding is None:
+            staged_paths = wav_paths
+        else:
+            staged_paths = [work_path / f"{index}.{encoding.extension}" for index in range(len(pending))]
+            _encode_clips(wav_paths, encoding, staged_paths)
+        for staged_path, (_, cached_path) in zip(staged_paths, pending):
+            os.replace(staged_path, cached_path)
+
+
+def _evict_if_needed(keep: Set[Path]) -> None:
+    """Delete least recently used clips until the cache fits its size budget."""
+    cache_dir = Path(config.tts_cache_path)
+    entries = []
+    total_bytes = 0
+    for path in cache_dir.iterdir():
+        if path.name.startswith(".") or not path.is_file():
+            continue
+        stat = path.stat()
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes += stat.st_size
+    if total_bytes <= config.tts_cache_max_bytes:
+        return
+    for _, size, path in sorted(entries):
+        if path in keep:
+            continue
+        path.unlink(missing_ok=True)
+        total_bytes -= size
+        if total_bytes <= config.tts_cache_max_bytes:
+            break
+
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    if destination.exists():
+        destination.unlink()
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def synthesize_speech_batch(
+    requests: Sequence[Tuple[str, Path]], encoding: Optional[ClipEncoding] = None
+) -> List[Path]:
+    """Place spoken clips for (text, destination) pairs, synthesizing only cache misses.
+
+    Misses are synthesized back to back with the persistent Piper engine and
+    encoded by a single ffmpeg process. With no encoding the clips are Piper's
+    WAV output. Destinations are hard links (or copies) of the cached clips, so
+    cache eviction never affects callers.
+    """
+    texts = [text for text, _ in requests]
+    cached_paths = _fill_cache(texts, encoding)
+    pending = list(range(len(requests)))
+    while pending:
+        # Linked under the lock, so another batch cannot evict a clip between lookup and link
+        evicted: List[int] = []
+        with _cache_lock:
+            for index in pending:
+                try:
+                    _link_or_copy(cached_paths[index], requests[index][1])
+                except FileNotFoundError:
+                    if cached_paths[index].exists():
+                        raise  # the destination's directory is missing
+                    evicted.append(index)
+        if evicted:
+            print(f"[TTS] {len(evicted)} cached clips were evicted before use, synthesizing again")
+            _fill_cache([texts[index] for index in evicted], encoding)
+        pending = evicted
+    return [destination for _, destination in requests]
+
+
+def synthesize_speech(text: str, destination: Path, encoding: Optional[ClipEncoding] = None) -> Path:
+    """Place a spoken clip of `text` at `destination`, synthesizing it only on a cache miss."""
+    return synthesize_speech_batch([(text, destination)], encoding)[0]
+
+
+def warm_speech_cache(texts: Sequence[str], encoding: Optional[ClipEncoding] = None) -> None:
+    """Synthesize any of `texts` missing from the cache so later requests are hits."""
+    _fill_cache(texts, encoding)
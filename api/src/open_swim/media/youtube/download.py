@@ -2,30 +2,63 @@ import os
 from pathlib import Path
 import secrets
 import subprocess
+from typing import List
 
 from open_swim.config import config
 
+# Smallest native audio stream that still holds up when rendered to 128k MP3:
+# prefer streams of at least ~100 kbps and, among those, the one closest to 128 kbps
+# (typically opus ~130k or m4a 128k). Falls back to the closest stream overall.
+NATIVE_AUDIO_FORMAT = "ba[abr>=100]/ba"
+NATIVE_AUDIO_SORT = "abr~128"
 
-def download_audio(tmp_path: Path, video_id: str) -> str:
-    """Download a YouTube video as an MP3 to a temp path and return the filepath."""
-    if not video_id:
-        raise ValueError("Video ID is required")
 
-    video_url = f"https://www.youtube.com/watch?v={video_id}"
-    output_path = tmp_path / f"{secrets.token_hex(16)}.mp3"
+def _native_audio_args(output_template: Path) -> List[str]:
+    """yt-dlp args that keep the selected audio stream in its original container."""
+    return [
+        "-f",
+        NATIVE_AUDIO_FORMAT,
+        "-S",
+        NATIVE_AUDIO_SORT,
+        "-o",
+        f"{output_template}.%(ext)s",
+    ]
+
 
-    command = [
-        config.ytdlp_path,
+def _mp3_audio_args(output_template: Path) -> List[str]:
+    """yt-dlp args that transcode the best audio stream to V0 MP3."""
+    return [
         "-x",
         "--audio-format",
         "mp3",
         "--audio-quality",
         "0",
         "-o",
-        str(output_path),
-        video_url,
+        f"{output_template}.mp3",
     ]
 
+
+def download_audio(tmp_path: Path, video_id: str) -> str:
+    """Download a YouTube video's audio to a temp path and return the filepath.
+
+    In the default "native" mode the audio stream is kept in its container
+    (webm/opus, m4a, ...) and handed to the render step as-is, avoiding yt-dlp's
+    own MP3 transcode. YOUTUBE_DOWNLOAD_FORMAT=mp3 restores the MP3 download.
+    """
+    if not video_id:
+        raise ValueError("Video ID is required")
+
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
+    token = secrets.token_hex(16)
+    output_template = tmp_path / token
+
+    if config.youtube_download_format == "mp3":
+        format_args = _mp3_audio_args(output_template)
+    else:
+        format_args = _native_audio_args(output_template)
+
+    command = [config.ytdlp_path, *format_args, video_url]
+
     print(f"Downloading: {video_url}")
 
     try:
@@ -42,9 +75,10 @@ def download_audio(tmp_path: Path, video_id: str) -> str:
         print(f"yt-dlp error: {result.stderr}")
         raise RuntimeError(f"Failed to download video: {result.stderr}")
 
-    if not os.path.exists(output_path):
+    downloaded = [
+        path for path in tmp_path.glob(f"{token}.*") if not path.name.endswith(".part")
+    ]
+    if not downloaded or not os.path.exists(downloaded[0]):
         raise RuntimeError("Downloaded file not found")
 
-    return str(output_path)
-
-
+    return str(downloaded[0])
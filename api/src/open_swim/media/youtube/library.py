@@ -1,11 +1,17 @@
 import os
 import re
-import shutil
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Tuple
 
 from open_swim.config import config
+from open_swim.media import blob_store
 from open_swim.media.youtube import store
-from open_swim.media.youtube.models import VideoRecord, VideoStatus, YouTubeLibrary
+from open_swim.media.youtube.models import (
+    LoudnessMeasurement,
+    VideoRecord,
+    VideoStatus,
+    YouTubeLibrary,
+)
 from open_swim.media.youtube.playlists import YoutubeVideo
 
 
@@ -19,14 +25,21 @@ def save_library(library: YouTubeLibrary) -> None:
     store.save_library(library)
 
 
+def flush_library() -> None:
+    """Write pending library changes to disk."""
+    store.flush_library()
+
+
 def get_library_video_info(video_id: str) -> Optional[VideoRecord]:
     """Return a stored video record if present."""
-    library_data = load_library()
-    return library_data.videos.get(video_id)
+    return store.get_video(video_id)
 
 
-def _save_normalized_file_to_library(temp_normalized_mp3_path: str, youtube_video: YoutubeVideo) -> str:
-    """Copy the normalized MP3 into the library with a sanitized filename."""
+def _save_normalized_file_to_library(temp_normalized_mp3_path: str, youtube_video: YoutubeVideo) -> Tuple[str, str]:
+    """Store the normalized MP3 as a blob and link it into the library under a sanitized filename.
+
+    Returns the readable path and the blob hash.
+    """
     os.makedirs(config.youtube_library_path, exist_ok=True)
 
     sanitized_title = re.sub(r"[^\w\s-]", "", youtube_video.title)
@@ -35,9 +48,21 @@ def _save_normalized_file_to_library(temp_normalized_mp3_path: str, youtube_vide
     filename = f"{sanitized_title}__normalized__{youtube_video.id}.mp3"
     destination_path = os.path.join(config.youtube_library_path, filename)
 
-    shutil.copy2(temp_normalized_mp3_path, destination_path)
-    print(f"[File Copy] Normalized MP3 copied to {destination_path}")
-    return destination_path
+    blob_hash = blob_store.store_blob(Path(temp_normalized_mp3_path))
+    blob_store.link_blob(blob_hash, Path(destination_path))
+    print(f"[File Copy] Normalized MP3 stored as blob {blob_hash[:12]} at {destination_path}")
+    return destination_path, blob_hash
+
+
+def _remove_previous_library_file(previous: Optional[VideoRecord], current_path: str) -> None:
+    """Drop the old readable name after a title change; the blob store keeps the content."""
+    if previous is None or not previous.mp3_path or previous.mp3_path == current_path:
+        return
+    if os.path.dirname(os.path.abspath(previous.mp3_path)) != os.path.abspath(config.youtube_library_path):
+        return
+    if os.path.exists(previous.mp3_path):
+        print(f"[File Copy] Removing renamed library file {previous.mp3_path}")
+        os.remove(previous.mp3_path)
 
 
 def add_normalized_mp3_to_library(
@@ -46,36 +71,86 @@ def add_normalized_mp3_to_library(
     playlist_id: str | None = None,
 ) -> VideoRecord:
     """Store a normalized MP3 and update the library record."""
-    normalized_mp3_file_library_path = _save_normalized_file_to_library(
+    normalized_mp3_file_library_path, blob_hash = _save_normalized_file_to_library(
         temp_normalized_mp3_path=temp_normalized_mp3_path, youtube_video=youtube_video
     )
 
-    library_data = load_library()
-    existing = library_data.videos.get(youtube_video.id)
-
-    record = VideoRecord(
-        id=youtube_video.id,
-        title=youtube_video.title,
-        mp3_path=normalized_mp3_file_library_path,
-        status=VideoStatus.READY,
-        playlist_ids=existing.playlist_ids if existing else [],
+    _remove_previous_library_file(
+        get_library_video_info(youtube_video.id), normalized_mp3_file_library_path
     )
-    if playlist_id and playlist_id not in record.playlist_ids:
-        record.playlist_ids.append(playlist_id)
 
-    library_data.videos[youtube_video.id] = record
-    save_library(library_data)
-    return record
+    def mutate(existing: Optional[VideoRecord]) -> VideoRecord:
+        record = VideoRecord(
+            id=youtube_video.id,
+            title=youtube_video.title,
+            mp3_path=normalized_mp3_file_library_path,
+            blob_hash=blob_hash,
+            status=VideoStatus.READY,
+            playlist_ids=existing.playlist_ids if existing else [],
+            loudness=existing.loudness if existing else None,
+        )
+        if playlist_id and playlist_id not in record.playlist_ids:
+            record.playlist_ids.append(playlist_id)
+        return record
+
+    return store.update_video(youtube_video.id, mutate)
+
+
+def ensure_video_file(record: VideoRecord) -> bool:
+    """Check that a READY video's file is in place, relinking it from its blob if needed.
+
+    Files from before the blob store are adopted into it on first sight. With
+    LIBRARY_VERIFY_BLOBS the blob is also re-hashed. Returns False when the video
+    has to be processed again.
+    """
+    if not record.mp3_path:
+        return False
+    mp3_path = Path(record.mp3_path)
+    if record.blob_hash is None:
+        if not mp3_path.exists():
+            return False
+        blob_hash = blob_store.adopt_file(mp3_path)
+
+        def mutate(existing: Optional[VideoRecord]) -> VideoRecord:
+            existing = existing or record
+            existing.blob_hash = blob_hash
+            return existing
+
+        store.update_video(record.id, mutate)
+        return True
+    return blob_store.restore_link(record.blob_hash, mp3_path, verify=config.library_verify_blobs)
 
 
 def update_video_status(video_id: str, status: VideoStatus, error_message: str | None = None) -> None:
     """Update status for a video in the library."""
-    library_data = load_library()
-    record = library_data.videos.get(video_id)
-    if record is None:
-        record = VideoRecord(id=video_id, title="", status=status, error_message=error_message)
-    else:
+
+    def mutate(record: Optional[VideoRecord]) -> VideoRecord:
+        if record is None:
+            return VideoRecord(id=video_id, title="", status=status, error_message=error_message)
         record.status = status
         record.error_message = error_message
-    library_data.videos[video_id] = record
-    save_library(library_data)
+        return record
+
+    store.update_video(video_id, mutate)
+
+
+def get_loudness_measurement(video_id: str, source_hash: str) -> Optional[LoudnessMeasurement]:
+    """Return the stored loudness measurement if it was taken from the same source file."""
+    record = get_library_video_info(video_id)
+    if record is None or record.loudness is None:
+        return None
+    if record.loudness.source_hash != source_hash:
+        return None
+    return record.loudness
+
+
+def save_loudness_measurement(video_id: str, measurement: LoudnessMeasurement) -> None:
+    """Store the first-pass loudness measurement on the video record."""
+
+    def mutate(record: Optional[VideoRecord]) -> VideoRecord:
+        if record is None:
+            record = VideoRecord(id=video_id, title="")
+        record.loudness = measurement
+        return record
+
+    store.update_video(video_id, mutate)
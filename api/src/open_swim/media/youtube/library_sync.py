@@ -1,141 +1,242 @@
-import os
-from pathlib import Path
+import queue
+import shutil
 import tempfile
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
 
+from open_swim.config import config
 from open_swim.messaging.models import SyncItemStatus, SyncPhase, SyncProgressMessage
 from open_swim.messaging.progress import get_progress_reporter
 from open_swim.media.youtube.download import download_audio
-from open_swim.media.youtube.intro_processor import add_intro_to_video
+from open_swim.media.hashing import sha256_file
+from open_swim.media.youtube.intro_processor import warm_title_audio
 from open_swim.media.youtube.library import (
+    get_loudness_measurement,
+    save_loudness_measurement,
     add_normalized_mp3_to_library,
+    ensure_video_file,
+    flush_library,
     get_library_video_info,
     update_video_status,
 )
-from open_swim.media.youtube.models import PlaylistRequest, VideoStatus
-from open_swim.media.youtube.normalize import get_normalized_loudness_file
-from open_swim.media.youtube.playlists import PlaylistInfo, YoutubeVideo, fetch_playlist_information
+from open_swim.media.youtube.models import LoudnessMeasurement, PlaylistRequest, VideoStatus
+from open_swim.media.youtube.normalize import measure_loudness
+from open_swim.media.youtube.render import render_track
+from open_swim.media.youtube.playlist_cache import get_playlist_information
+from open_swim.media.youtube.playlists import PlaylistInfo, YoutubeVideo
 from open_swim.media.youtube.playlists_to_sync import load_playlists_to_sync
 
 
-def get_playlists_to_sync() -> List[PlaylistInfo]:
-    """Return a list of playlist URLs to sync from requests saved on disk."""
+def iter_playlists_to_sync() -> Iterator[PlaylistInfo]:
+    """Resolve the requested playlists concurrently and yield them in request order.
+
+    Each playlist is yielded as soon as it and all earlier ones are resolved, so
+    library sync can start on the first playlist while the rest are still being
+    enumerated. A playlist that fails to resolve is reported and skipped.
+    """
     playlists_to_sync: List[PlaylistRequest] = load_playlists_to_sync()
+    if not playlists_to_sync:
+        return
 
-    return [
-        fetch_playlist_information(
-            playlist_url=f"https://youtube.com/playlist?list={playlist.id.strip()}",
-            playlist_title=playlist.title,
-        )
-        for playlist in playlists_to_sync
-    ]
+    workers = max(1, min(config.playlist_fetch_workers, len(playlists_to_sync)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="playlist-fetch") as executor:
+        futures = [
+            executor.submit(
+                get_playlist_information, playlist_id=playlist.id, playlist_title=playlist.title
+            )
+            for playlist in playlists_to_sync
+        ]
+        for playlist, future in zip(playlists_to_sync, futures):
+            try:
+                yield future.result()
+            except Exception as exc:
+                print(f"[Playlist Sync] Failed to resolve playlist {playlist.title} - {playlist.id}: {exc}")
+                get_progress_reporter().report_progress(
+                    SyncProgressMessage(
+                        phase=SyncPhase.youtube_library,
+                        status=SyncItemStatus.error,
+                        playlist_id=playlist.id,
+                        playlist_title=playlist.title,
+                        error_message=str(exc),
+                    )
+                )
 
 
-def _sync_video_to_library(
-    video: YoutubeVideo,
-    playlist_id: str,
-    playlist_title: str,
-    current_index: int,
-    total_count: int,
+def get_playlists_to_sync() -> List[PlaylistInfo]:
+    """Return the resolved playlists requested on disk, in request order."""
+    return list(iter_playlists_to_sync())
+
+
+@dataclass
+class _VideoJob:
+    """A video travelling through the download -> normalize/intro pipeline."""
+
+    video: YoutubeVideo
+    playlist_id: str
+    playlist_title: str
+    current_index: int
+    total_count: int
+    tmp_path: Optional[Path] = None
+    downloaded_path: Optional[str] = None
+
+
+def _report_video_progress(
+    job: _VideoJob, status: SyncItemStatus, error_message: str | None = None
 ) -> None:
-    """Sync a single video to the library, downloading and normalizing if needed."""
-    reporter = get_progress_reporter()
+    get_progress_reporter().report_progress(
+        SyncProgressMessage(
+            phase=SyncPhase.youtube_library,
+            status=status,
+            playlist_id=job.playlist_id,
+            playlist_title=job.playlist_title,
+            item_id=job.video.id,
+            item_title=job.video.title,
+            current_index=job.current_index,
+            total_count=job.total_count,
+            error_message=error_message,
+        )
+    )
+
+
+def _is_video_ready_in_library(video: YoutubeVideo) -> bool:
     library_video_info = get_library_video_info(video.id)
-    if (
+    return bool(
         library_video_info
         and library_video_info.status == VideoStatus.READY
-        and library_video_info.mp3_path
-        and os.path.exists(library_video_info.mp3_path)
-    ):
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.youtube_library,
-                status=SyncItemStatus.skipped,
-                playlist_id=playlist_id,
-                playlist_title=playlist_title,
-                item_id=video.id,
-                item_title=video.title,
-                current_index=current_index,
-                total_count=total_count,
-            )
-        )
-        return
+        and ensure_video_file(library_video_info)
+    )
 
-    print(f"[Library Sync] Processing video {video.title} - {video.id}...")
-    try:
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.youtube_library,
-                status=SyncItemStatus.downloading,
-                playlist_id=playlist_id,
-                playlist_title=playlist_title,
-                item_id=video.id,
-                item_title=video.title,
-                current_index=current_index,
-                total_count=total_count,
-            )
-        )
-        update_video_status(video.id, VideoStatus.DOWNLOADING)
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir)
-            temp_downloaded_mp3_path = download_audio(tmp_path=tmp_path, video_id=video.id)
-
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.youtube_library,
-                    status=SyncItemStatus.normalizing,
-                    playlist_id=playlist_id,
-                    playlist_title=playlist_title,
-                    item_id=video.id,
-                    item_title=video.title,
-                    current_index=current_index,
-                    total_count=total_count,
-                )
-            )
-            update_video_status(video.id, VideoStatus.NORMALIZING)
-            temp_normalized_mp3_path = get_normalized_loudness_file(
-                tmp_path=tmp_path, mp3_file_path=temp_downloaded_mp3_path
-            )
 
-            update_video_status(video.id, VideoStatus.ADDING_INTRO)
-            final_mp3_path = add_intro_to_video(
-                video=video,
-                normalized_mp3_path=temp_normalized_mp3_path,
-                output_dir=tmp_path,
-            )
-            add_normalized_mp3_to_library(
-                youtube_video=video,
-                temp_normalized_mp3_path=final_mp3_path,
-                playlist_id=playlist_id,
-            )
-            reporter.report_progress(
-                SyncProgressMessage(
-                    phase=SyncPhase.youtube_library,
-                    status=SyncItemStatus.completed,
-                    playlist_id=playlist_id,
-                    playlist_title=playlist_title,
-                    item_id=video.id,
-                    item_title=video.title,
-                    current_index=current_index,
-                    total_count=total_count,
-                )
-            )
+def _fail_video_job(job: _VideoJob, exc: Exception) -> None:
+    print(f"[Error] Failed to sync video {job.video.title} - {job.video.id}: {str(exc)}")
+    update_video_status(job.video.id, VideoStatus.ERROR, str(exc))
+    _report_video_progress(job, SyncItemStatus.error, error_message=str(exc))
+
+
+def _cleanup_video_job(job: _VideoJob) -> None:
+    if job.tmp_path is not None:
+        shutil.rmtree(job.tmp_path, ignore_errors=True)
+        job.tmp_path = None
+
+
+def _download_video(job: _VideoJob) -> bool:
+    """Download stage (I/O-bound). Returns True when the job can move on to processing."""
+    print(f"[Library Sync] Processing video {job.video.title} - {job.video.id}...")
+    try:
+        _report_video_progress(job, SyncItemStatus.downloading)
+        update_video_status(job.video.id, VideoStatus.DOWNLOADING)
+        job.tmp_path = Path(tempfile.mkdtemp(prefix=f"open_swim_{job.video.id}_"))
+        job.downloaded_path = download_audio(tmp_path=job.tmp_path, video_id=job.video.id)
+        return True
     except Exception as exc:
-        update_video_status(video.id, VideoStatus.ERROR, str(exc))
-        reporter.report_progress(
-            SyncProgressMessage(
-                phase=SyncPhase.youtube_library,
-                status=SyncItemStatus.error,
-                playlist_id=playlist_id,
-                playlist_title=playlist_title,
-                item_id=video.id,
-                item_title=video.title,
-                current_index=current_index,
-                total_count=total_count,
-                error_message=str(exc),
-            )
+        _fail_video_job(job, exc)
+        _cleanup_video_job(job)
+        return False
+
+
+def _get_or_measure_loudness(video_id: str, source_path: str) -> Optional[LoudnessMeasurement]:
+    """Return loudness measurements for the source, reusing stored values when its hash matches."""
+    if not config.loudnorm_two_pass:
+        return None
+    source_hash = sha256_file(source_path)
+    measurement = get_loudness_measurement(video_id, source_hash)
+    if measurement is not None:
+        print(f"[Library Sync] Reusing loudness measurement for {video_id}")
+        return measurement
+    measurement = measure_loudness(source_path=source_path, source_hash=source_hash)
+    save_loudness_measurement(video_id, measurement)
+    return measurement
+
+
+def _process_video(job: _VideoJob) -> None:
+    """Render stage (CPU-bound): normalize + intro in one pass, then store in the library."""
+    if job.tmp_path is None or job.downloaded_path is None:
+        raise ValueError(f"Video {job.video.id} reached processing without a download")
+    try:
+        _report_video_progress(job, SyncItemStatus.normalizing)
+        update_video_status(job.video.id, VideoStatus.NORMALIZING)
+        measurement = _get_or_measure_loudness(job.video.id, job.downloaded_path)
+        final_mp3_path = render_track(
+            video=job.video,
+            source_path=job.downloaded_path,
+            output_dir=job.tmp_path,
+            measurement=measurement,
+        )
+        add_normalized_mp3_to_library(
+            youtube_video=job.video,
+            temp_normalized_mp3_path=final_mp3_path,
+            playlist_id=job.playlist_id,
         )
-        raise
+        _report_video_progress(job, SyncItemStatus.completed)
+    except Exception as exc:
+        _fail_video_job(job, exc)
+    finally:
+        _cleanup_video_job(job)
+
+
+def _run_video_pipeline(jobs: List[_VideoJob]) -> None:
+    """Run jobs through bounded download and processing worker pools connected by queues.
+
+    Downloads of later videos overlap with ffmpeg work on earlier ones. The processing
+    queue is bounded so downloads cannot run far ahead and fill the temp directory.
+    """
+    if not jobs:
+        return
+
+    download_workers = max(1, min(config.youtube_download_workers, len(jobs)))
+    process_workers = max(1, min(config.youtube_process_workers, len(jobs)))
+
+    download_queue: "queue.Queue[Optional[_VideoJob]]" = queue.Queue()
+    process_queue: "queue.Queue[Optional[_VideoJob]]" = queue.Queue(maxsize=process_workers * 2)
+
+    for job in jobs:
+        download_queue.put(job)
+    for _ in range(download_workers):
+        download_queue.put(None)
+
+    def _download_worker() -> None:
+        while True:
+            job = download_queue.get()
+            if job is None:
+                return
+            try:
+                if _download_video(job):
+                    process_queue.put(job)
+            except Exception as exc:  # pragma: no cover - keep the pool alive
+                print(f"[Library Sync] Download worker error for {job.video.id}: {exc}")
+                _cleanup_video_job(job)
+
+    def _process_worker() -> None:
+        while True:
+            job = process_queue.get()
+            if job is None:
+                return
+            try:
+                _process_video(job)
+            except Exception as exc:  # pragma: no cover - keep the pool alive
+                print(f"[Library Sync] Process worker error for {job.video.id}: {exc}")
+                _cleanup_video_job(job)
+
+    downloaders = [
+        threading.Thread(target=_download_worker, name=f"yt-download-{i}", daemon=True)
+        for i in range(download_workers)
+    ]
+    processors = [
+        threading.Thread(target=_process_worker, name=f"yt-process-{i}", daemon=True)
+        for i in range(process_workers)
+    ]
+    for thread in downloaders + processors:
+        thread.start()
+
+    for thread in downloaders:
+        thread.join()
+    for _ in processors:
+        process_queue.put(None)
+    for thread in processors:
+        thread.join()
 
 
 def _sync_library_playlist(playlist_info: PlaylistInfo) -> None:
@@ -150,17 +251,29 @@ def _sync_library_playlist(playlist_info: PlaylistInfo) -> None:
             total_count=total_videos,
         )
     )
+    jobs: List[_VideoJob] = []
     for index, video in enumerate(playlist_info.videos, start=1):
-        try:
-            _sync_video_to_library(
-                video=video,
-                playlist_id=playlist_info.id,
-                playlist_title=playlist_info.title,
-                current_index=index,
-                total_count=total_videos,
-            )
-        except Exception as e:
-            print(f"[Error] Failed to sync video {video.title} - {video.id}: {str(e)}")
+        job = _VideoJob(
+            video=video,
+            playlist_id=playlist_info.id,
+            playlist_title=playlist_info.title,
+            current_index=index,
+            total_count=total_videos,
+        )
+        if _is_video_ready_in_library(video):
+            _report_video_progress(job, SyncItemStatus.skipped)
+            continue
+        jobs.append(job)
+
+    if jobs:
+        # Load the Piper voice once and synthesize all titles while the first downloads run
+        threading.Thread(
+            target=warm_title_audio,
+            args=([job.video for job in jobs],),
+            name="yt-title-tts",
+            daemon=True,
+        ).start()
+    _run_video_pipeline(jobs)
     print(f"[Playlist] Extracted and processed {len(playlist_info.videos)} videos from playlist.")
     reporter.report_progress(
         SyncProgressMessage(
@@ -174,8 +287,14 @@ def _sync_library_playlist(playlist_info: PlaylistInfo) -> None:
     )
 
 
-def sync_youtube_playlists_to_library(playlists_to_sync: List[PlaylistInfo]) -> None:
-    """Sync all playlists specified in environment variable to the library."""
-    for playlist in playlists_to_sync:
-        print(f"[Playlist Sync] Syncing playlist: {playlist.title}")
-        _sync_library_playlist(playlist)
+def sync_youtube_playlists_to_library(playlists_to_sync: Iterable[PlaylistInfo]) -> List[PlaylistInfo]:
+    """Sync playlists to the library as they become available and return the synced playlists."""
+    synced: List[PlaylistInfo] = []
+    try:
+        for playlist in playlists_to_sync:
+            print(f"[Playlist Sync] Syncing playlist: {playlist.title}")
+            _sync_library_playlist(playlist)
+            synced.append(playlist)
+    finally:
+        flush_library()
+    return synced
@@ -22,6 +22,22 @@ class PlaylistRequest(BaseModel):
     title: str
 
 
+class LoudnessMeasurement(BaseModel):
+    """First-pass loudnorm analysis of a downloaded source, keyed by its content hash.
+
+    The `input_*` values describe the source alone. `target_offset` is relative
+    to the I/TP/LRA `targets` of the pass and is only applied with those targets.
+    """
+
+    source_hash: str
+    targets: str = ""
+    input_i: float
+    input_tp: float
+    input_lra: float
+    input_thresh: float
+    target_offset: float
+
+
 class VideoRecord(BaseModel):
     """Normalized YouTube track stored in the library."""
 
@@ -29,8 +45,10 @@ class VideoRecord(BaseModel):
     title: str
     status: VideoStatus = VideoStatus.PENDING
     mp3_path: Optional[str] = None
+    blob_hash: Optional[str] = None
     playlist_ids: List[str] = Field(default_factory=list)
     error_message: Optional[str] = None
+    loudness: Optional[LoudnessMeasurement] = None
 
     class Config:
         arbitrary_types_allowed = True
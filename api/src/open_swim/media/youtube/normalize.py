@@ -1,46 +1,94 @@
-from pathlib import Path
-import secrets
+import json
+import math
 import subprocess
+from typing import Optional
 
 from open_swim.config import config
+from open_swim.media.youtube.models import LoudnessMeasurement
 
+# Loudness targets for Open Swim playback. The extra gain keeps tracks audible
+# over water noise; the encoder bitrate matches the rest of the library.
+LOUDNORM_TARGET_I = -10.0
+LOUDNORM_TARGET_TP = -1.0
+LOUDNORM_TARGET_LRA = 11.0
+POST_GAIN_DB = 6
+OUTPUT_BITRATE = "128k"
 
-def get_normalized_loudness_file(tmp_path: Path, mp3_file_path: str) -> str:
-    """
-    A downloded MP3 file is normalized using ffmpeg's loudnorm filter to use in Open Swim  audio playback. bitrate is set to 128k. 
-    The normalized file is saved in a temp directory and the path to the normalized file is returned.  
-    use this logic for the temp temp file:
-        # Set output directory
-    output_dir = '/tmp' if os.name != 'nt' else os.environ.get('TEMP', '.')
-        
-    
-    # Generate random temp filename
-    temp_filename = f"{secrets.token_hex(16)}.mp3"
-    output_path = os.path.join(output_dir, temp_filename)
+
+def loudnorm_targets() -> str:
+    """The loudnorm I/TP/LRA options; stored with each measurement taken with them."""
+    return f"I={LOUDNORM_TARGET_I}:TP={LOUDNORM_TARGET_TP}:LRA={LOUDNORM_TARGET_LRA}"
+
+
+def loudness_filter(measurement: Optional[LoudnessMeasurement] = None) -> str:
+    """Return the ffmpeg audio filter chain that normalizes a track's loudness.
+
+    Without a measurement loudnorm runs single-pass (dynamic mode). With one it
+    applies the stored first-pass values in linear mode, which is faster and
+    preserves the track's dynamics. A measurement taken with other targets is
+    still applied; only its offset, which belongs to those targets, is left out.
     """
-  
-    
-    # Generate random temp filename
-    temp_filename = f"{secrets.token_hex(16)}.mp3"
-    output_path = tmp_path / temp_filename
-    
-    # Build ffmpeg command with loudnorm filter and 128k bitrate
-    print(f"Normalizing loudness for file: {mp3_file_path}")
+    loudnorm = f"loudnorm={loudnorm_targets()}"
+    if measurement is not None and _is_usable(measurement):
+        loudnorm += (
+            f":measured_I={measurement.input_i}"
+            f":measured_TP={measurement.input_tp}"
+            f":measured_LRA={measurement.input_lra}"
+            f":measured_thresh={measurement.input_thresh}"
+        )
+        if measurement.targets == loudnorm_targets() and math.isfinite(measurement.target_offset):
+            loudnorm += f":offset={measurement.target_offset}"
+        loudnorm += ":linear=true"
+    return f"{loudnorm},volume={POST_GAIN_DB}dB"
+
+
+def _is_usable(measurement: LoudnessMeasurement) -> bool:
+    # Silent sources report -inf, which loudnorm will not accept as a measured value
+    return all(
+        math.isfinite(value)
+        for value in (
+            measurement.input_i,
+            measurement.input_tp,
+            measurement.input_lra,
+            measurement.input_thresh,
+        )
+    )
+
+
+def measure_loudness(source_path: str, source_hash: str) -> LoudnessMeasurement:
+    """Run the loudnorm analysis pass over a source file and return its measurements."""
+    print(f"Measuring loudness for file: {source_path}")
     cmd = [
         config.ffmpeg_path,
-        '-i', mp3_file_path,
-        '-af', 'loudnorm=I=-10:TP=-1.0:LRA=11,volume=6dB',
-        '-b:a', '128k',
-        '-y',  # Overwrite output file if it exists
-        str(output_path)
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        source_path,
+        "-af",
+        f"loudnorm={loudnorm_targets()}:print_format=json",
+        "-f",
+        "null",
+        "-",
     ]
-    
-    # Execute ffmpeg command
     result = subprocess.run(cmd, capture_output=True, text=True)
-    
     if result.returncode != 0:
         raise RuntimeError(f"ffmpeg failed: {result.stderr}")
-    
-    return str(output_path) 
-
 
+    # loudnorm prints its summary as the last JSON object on stderr
+    start = result.stderr.rfind("{")
+    end = result.stderr.rfind("}")
+    if start == -1 or end < start:
+        raise RuntimeError("ffmpeg loudnorm analysis produced no measurements")
+    try:
+        data = json.loads(result.stderr[start : end + 1])
+        return LoudnessMeasurement(
+            source_hash=source_hash,
+            targets=loudnorm_targets(),
+            input_i=float(data["input_i"]),
+            input_tp=float(data["input_tp"]),
+            input_lra=float(data["input_lra"]),
+            input_thresh=float(data["input_thresh"]),
+            target_offset=float(data["target_offset"]),
+        )
+    except (ValueError, KeyError) as exc:
+        raise RuntimeError(f"Failed to parse loudnorm measurements: {exc}") from exc
@@ -0,0 +1,129 @@
+"""Persistent cache of yt-dlp flat-playlist metadata.
+
+Each playlist is stored as `LIBRARY_PATH/youtube/playlist_cache/<id>.json`.
+Entries younger than PLAYLIST_CACHE_TTL_SECONDS are served as-is; older entries
+are served immediately while a background refresh fetches the current listing
+(stale-while-revalidate). Only a missing entry blocks on yt-dlp.
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Set
+
+from pydantic import BaseModel
+
+from open_swim.config import config
+from open_swim.media.youtube.playlists import PlaylistInfo, fetch_playlist_information
+
+
+class CachedPlaylist(BaseModel):
+    """A playlist listing and when it was fetched."""
+
+    fetched_at: float
+    playlist: PlaylistInfo
+
+
+# YouTube list ids; anything else could name a path outside the cache directory
+_PLAYLIST_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+_refreshing: Set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def playlist_url(playlist_id: str) -> str:
+    return f"https://youtube.com/playlist?list={playlist_id.strip()}"
+
+
+def _cache_dir() -> Path:
+    return Path(config.youtube_library_path) / "playlist_cache"
+
+
+def _cache_path(playlist_id: str) -> Path:
+    """Cache file of a playlist; raises ValueError for anything but a YouTube list id."""
+    playlist_id = playlist_id.strip()
+    if not _PLAYLIST_ID_PATTERN.fullmatch(playlist_id):
+        raise ValueError(f"Invalid playlist id: {playlist_id!r}")
+    return _cache_dir() / f"{playlist_id}.json"
+
+
+def _load_entry(playlist_id: str) -> Optional[CachedPlaylist]:
+    path = _cache_path(playlist_id)
+    if not path.exists():
+        return None
+    try:
+        return CachedPlaylist.model_validate_json(path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"[Playlist Cache] Ignoring unreadable cache entry {path}: {exc}")
+        return None
+
+
+def _store_entry(playlist_id: str, playlist: PlaylistInfo) -> None:
+    path = _cache_path(playlist_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = CachedPlaylist(fetched_at=time.time(), playlist=playlist)
+    tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(entry.model_dump_json(by_alias=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _fetch_and_store(playlist_id: str, playlist_title: str) -> PlaylistInfo:
+    playlist = fetch_playlist_information(
+        playlist_url=playlist_url(playlist_id), playlist_title=playlist_title
+    )
+    _store_entry(playlist_id, playlist)
+    return playlist
+
+
+def _refresh_in_background(playlist_id: str, playlist_title: str) -> None:
+    with _refreshing_lock:
+        if playlist_id in _refreshing:
+            return
+        _refreshing.add(playlist_id)
+
+    def _work() -> None:
+        try:
+            _fetch_and_store(playlist_id, playlist_title)
+            print(f"[Playlist Cache] Refreshed {playlist_title} ({playlist_id})")
+        except Exception as exc:
+            print(f"[Playlist Cache] Background refresh failed for {playlist_id}: {exc}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(playlist_id)
+
+    threading.Thread(target=_work, name=f"playlist-refresh-{playlist_id}", daemon=True).start()
+
+
+def get_playlist_information(playlist_id: str, playlist_title: str) -> PlaylistInfo:
+    """Return playlist metadata from the cache, fetching with yt-dlp only when needed.
+
+    Raises ValueError for an id that is not a YouTube list id, and ValueError or
+    RuntimeError (from yt-dlp) when there is no cached entry and the fetch fails.
+    """
+    entry = _load_entry(playlist_id)
+    if entry is None:
+        return _fetch_and_store(playlist_id, playlist_title)
+
+    age = time.time() - entry.fetched_at
+    if age > config.playlist_cache_ttl_seconds:
+        print(f"[Playlist Cache] Serving stale {playlist_title} ({int(age)}s old), refreshing")
+        _refresh_in_background(playlist_id, playlist_title)
+    return entry.playlist
+
+
+def invalidate_playlist_cache(playlist_id: Optional[str] = None) -> None:
+    """Drop one cached playlist, or every cached playlist when no id is given.
+
+    Raises ValueError if `playlist_id` is not a YouTube list id.
+    """
+    if playlist_id:
+        _cache_path(playlist_id).unlink(missing_ok=True)
+        print(f"[Playlist Cache] Invalidated {playlist_id}")
+        return
+    cache_dir = _cache_dir()
+    if cache_dir.exists():
+        for path in cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+    print("[Playlist Cache] Invalidated all playlists")
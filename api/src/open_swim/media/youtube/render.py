@@ -0,0 +1,65 @@
+import secrets
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from open_swim.config import config
+from open_swim.media.youtube.models import LoudnessMeasurement
+from open_swim.media.youtube.intro_processor import generate_title_audio
+from open_swim.media.youtube.normalize import OUTPUT_BITRATE, loudness_filter
+from open_swim.media.youtube.playlists import YoutubeVideo
+
+INTRO_SILENCE_SECONDS = 0.5
+_OUTPUT_FORMAT = "aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+
+def _build_filter_graph(measurement: Optional[LoudnessMeasurement]) -> str:
+    """Source -> loudness, TTS intro, generated silence -> concat (intro, silence, track)."""
+    return ";".join(
+        [
+            f"[0:a]{loudness_filter(measurement)},{_OUTPUT_FORMAT}[track]",
+            f"[1:a]{_OUTPUT_FORMAT}[intro]",
+            f"anullsrc=r=44100:cl=stereo,atrim=duration={INTRO_SILENCE_SECONDS},{_OUTPUT_FORMAT}[silence]",
+            "[intro][silence][track]concat=n=3:v=0:a=1[out]",
+        ]
+    )
+
+
+def render_track(
+    video: YoutubeVideo,
+    source_path: str,
+    output_dir: Path,
+    measurement: Optional[LoudnessMeasurement] = None,
+) -> str:
+    """Render the final library MP3 for a downloaded track in a single ffmpeg pass.
+
+    Loudness normalization and the spoken title intro are applied in one filter
+    graph so the audio is decoded once and encoded to MP3 exactly once. When a
+    loudness measurement is given, loudnorm runs in linear (apply-only) mode.
+    """
+    intro_path = generate_title_audio(video=video, output_dir=output_dir)
+    output_path = output_dir / f"rendered_{video.id}_{secrets.token_hex(16)}.mp3"
+
+    print(f"Rendering normalized track with intro for file: {source_path}")
+    cmd = [
+        config.ffmpeg_path,
+        "-i",
+        source_path,
+        "-i",
+        str(intro_path),
+        "-filter_complex",
+        _build_filter_graph(measurement),
+        "-map",
+        "[out]",
+        "-codec:a",
+        "libmp3lame",
+        "-b:a",
+        OUTPUT_BITRATE,
+        "-y",
+        str(output_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr}")
+
+    return str(output_path)
@@ -1,9 +1,18 @@
 import json
 import os
-from typing import List
+import threading
+from typing import Callable, List, Optional, Set
 
 from open_swim.config import config
-from open_swim.media.youtube.models import PlaylistRequest, YouTubeLibrary
+from open_swim.media.record_store import RecordStore, open_record_store
+from open_swim.media.youtube.models import (
+    PlaylistRequest,
+    VideoRecord,
+    YouTubeLibrary,
+)
+
+_library_records: Optional[RecordStore[VideoRecord]] = None
+_library_records_lock = threading.Lock()
 
 
 def load_playlist_requests() -> List[PlaylistRequest]:
@@ -24,19 +33,41 @@ def save_playlist_requests(requests: List[PlaylistRequest]) -> None:
         json.dump([req.model_dump() for req in requests], f, indent=2, default=str)
 
 
+def _records() -> RecordStore[VideoRecord]:
+    global _library_records
+    with _library_records_lock:
+        if _library_records is None:
+            _library_records = open_record_store(config.youtube_library_path, "videos", VideoRecord)
+        return _library_records
+
+
 def load_library() -> YouTubeLibrary:
     """Load YouTube library metadata."""
-    info_json_path = os.path.join(config.youtube_library_path, "info.json")
-    if not os.path.exists(info_json_path):
-        return YouTubeLibrary()
-    with open(info_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return YouTubeLibrary(**data)
+    return YouTubeLibrary(videos=_records().load_all())
 
 
 def save_library(library: YouTubeLibrary) -> None:
-    """Persist YouTube library metadata."""
-    os.makedirs(config.youtube_library_path, exist_ok=True)
-    info_json_path = os.path.join(config.youtube_library_path, "info.json")
-    with open(info_json_path, "w", encoding="utf-8") as f:
-        json.dump(library.model_dump(), f, indent=2, default=str)
+    """Persist YouTube library metadata, replacing all stored records."""
+    _records().replace_all(library.videos)
+
+
+def get_video(video_id: str) -> Optional[VideoRecord]:
+    """Load a single video record."""
+    return _records().get(video_id)
+
+
+def update_video(
+    video_id: str, mutate: Callable[[Optional[VideoRecord]], VideoRecord]
+) -> VideoRecord:
+    """Atomically replace a video record with `mutate(current)`."""
+    return _records().update(video_id, mutate)
+
+
+def referenced_blob_hashes() -> Set[str]:
+    """Blob hashes of all videos in the library."""
+    return {record.blob_hash for record in _records().load_all().values() if record.blob_hash}
+
+
+def flush_library() -> None:
+    """Write any pending library changes to disk."""
+    _records().flush()
@@ -1,4 +1,5 @@
 from open_swim.messaging.models import (
+    PlaylistCacheInvalidateRequest,
     PlaylistInfoRequest,
     PlaylistInfoResponse,
     PlaylistInfoVideoItem,
@@ -15,6 +16,7 @@ from open_swim.messaging.progress import (
 )
 
 __all__ = [
+    "PlaylistCacheInvalidateRequest",
     "PlaylistInfoRequest",
     "PlaylistInfoResponse",
     "PlaylistInfoVideoItem",
@@ -25,6 +25,10 @@ class PlaylistInfoResponse(BaseModel):
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class PlaylistCacheInvalidateRequest(BaseModel):
+    playlist_id: Optional[str] = None
+
+
 class SyncPhase(str, Enum):
     youtube_library = "youtube_library"
     podcast_library = "podcast_library"
@@ -43,6 +47,31 @@ class SyncItemStatus(str, Enum):
     error = "error"
 
 
+class DevicePlanFolder(BaseModel):
+    """What the capacity plan puts into one device folder."""
+
+    folder: str
+    playlist_id: Optional[str] = None
+    requested_items: int
+    planned_items: int
+    planned_bytes: int
+    dropped_item_ids: list[str] = Field(default_factory=list)
+
+
+class DevicePlanMessage(BaseModel):
+    """Device capacity plan, published before a device sync deletes anything."""
+
+    priority: list[str]
+    capacity_bytes: int
+    free_bytes: int
+    reclaimable_bytes: int
+    reserve_bytes: int
+    planned_bytes: int
+    projected_free_bytes: int
+    folders: list[DevicePlanFolder] = Field(default_factory=list)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
 class SyncProgressMessage(BaseModel):
     phase: SyncPhase
     status: SyncItemStatus
@@ -57,5 +86,10 @@ class SyncProgressMessage(BaseModel):
     total_count: Optional[int] = None
     percentage: Optional[float] = None
 
+    # Device copies: bytes written in the current folder and its running throughput
+    bytes_copied: Optional[int] = None
+    bytes_total: Optional[int] = None
+    bytes_per_second: Optional[float] = None
+
     error_message: Optional[str] = None
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 from typing import Optional, Protocol
 
-from open_swim.messaging.models import SyncProgressMessage
+from open_swim.messaging.models import DevicePlanMessage, SyncProgressMessage
 from open_swim.messaging.mqtt import MqttClient
 
 
@@ -11,11 +11,17 @@ class ProgressReporter(Protocol):
     def report_progress(self, message: SyncProgressMessage) -> None:
         ...
 
+    def report_device_plan(self, message: DevicePlanMessage) -> None:
+        ...
+
 
 class NullProgressReporter:
     def report_progress(self, message: SyncProgressMessage) -> None:
         return
 
+    def report_device_plan(self, message: DevicePlanMessage) -> None:
+        return
+
 
 class MqttProgressReporter:
     def __init__(self, mqtt_client: MqttClient) -> None:
@@ -45,6 +51,8 @@ class MqttProgressReporter:
                     "current_index": message.current_index,
                     "total_count": message.total_count,
                     "percentage": message.percentage,
+                    "bytes_copied": message.bytes_copied,
+                    "bytes_total": message.bytes_total,
                     "error_message": message.error_message,
                 },
                 default=str,
@@ -53,6 +61,13 @@ class MqttProgressReporter:
         except Exception:
             print("[PROGRESS] (failed to format progress message)")
 
+    def report_device_plan(self, message: DevicePlanMessage) -> None:
+        try:
+            payload = message.model_dump_json()
+            self._mqtt_client.publish("openswim/device/plan", payload, qos=1, retain=True)
+        except Exception as exc:  # pragma: no cover - best effort only
+            print(f"[MQTT] Failed to publish device plan: {exc}")
+
 
 _progress_reporter: Optional[ProgressReporter] = None
 
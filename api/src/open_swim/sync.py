@@ -3,9 +3,13 @@ import queue
 import threading
 from typing import Callable
 
+from open_swim.media import blob_store
+from open_swim.media.podcast import store as podcast_store
 from open_swim.media.podcast.sync import sync_podcast_episodes
-from open_swim.media.youtube.library_sync import get_playlists_to_sync, sync_youtube_playlists_to_library
+from open_swim.media.youtube import store as youtube_store
+from open_swim.media.youtube.library_sync import iter_playlists_to_sync, sync_youtube_playlists_to_library
 from open_swim.device.sync.device_sync import sync_device
+from open_swim.device.sync.mirror import build_device_mirror, load_device_mirror
 
 
 
@@ -35,18 +39,43 @@ threading.Thread(target=_sync_worker, daemon=True).start()
 def work() -> None:
     sync_podcast_episodes()
 
-    playlists_to_sync = get_playlists_to_sync()
-    sync_youtube_playlists_to_library(playlists_to_sync)
-    from open_swim.app import get_device_monitor
-    device_monitor = get_device_monitor()
-    if device_monitor is None or not device_monitor.connected:
+    playlists_to_sync = sync_youtube_playlists_to_library(iter_playlists_to_sync())
+    blob_store.remove_unreferenced_blobs(
+        youtube_store.referenced_blob_hashes() | podcast_store.referenced_blob_hashes()
+    )
+    # Keep the device tree ready in the library whether or not a device is connected
+    mirror = build_device_mirror(playlists_to_sync)
+    if not _device_connected():
         print("[SYNC] Skipping device sync: device not connected")
         return
 
-    sync_device(playlists_to_sync)
+    sync_device(mirror)
+
+
+def device_work() -> None:
+    """Sync the device from the last built mirror, without touching the library."""
+    if not _device_connected():
+        print("[SYNC] Skipping device sync: device not connected")
+        return
+    mirror = load_device_mirror()
+    if mirror is None:
+        print("[SYNC] No device mirror yet; the device is synced after the library")
+        return
+    sync_device(mirror)
+
+
+def _device_connected() -> bool:
+    from open_swim.app import get_device_monitor
+    device_monitor = get_device_monitor()
+    return device_monitor is not None and device_monitor.connected
 
 
 
 def enqueue_sync() -> None:
     """Enqueue a sync job so only one runs at a time."""
     _sync_task_queue.put(work)
+
+
+def enqueue_device_sync() -> None:
+    """Enqueue a device-only sync from the mirror, serialized with the other sync jobs."""
+    _sync_task_queue.put(device_work)